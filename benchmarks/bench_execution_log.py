@@ -0,0 +1,81 @@
+"""
+Benchmark of db.ExecutionLog, the per-statement execution log of DBWrapper.
+
+Times ExecutionLog.append (plus the successes/failures counters and a final
+to_df()) at 10k and 100k statements to show the cost per statement stays
+flat (linear total time). For reference, the DataFrame-based log it replaced
+(one row appended per statement, counters recomputed from the frame) is
+timed at a smaller size since its per-statement cost grows with the log.
+
+Usage:
+    python benchmarks/bench_execution_log.py [--sizes 10000 100000]
+        [--old-sizes 2000 4000]
+"""
+import argparse
+import time
+
+from pandas import DataFrame
+import pandas as pd
+
+import dfs.utils.db as udb
+
+SQL = "INSERT INTO playerstats (player, pts) VALUES ('Player {}', {})"
+
+
+def bench_execution_log (n):
+    """Returns seconds to log n statements (1% failures) and build to_df()."""
+    log = udb.ExecutionLog()
+    start = time.perf_counter()
+    for i in range(n):
+        success = i%100!=0
+        log.append(success, SQL.format(i, i%40), '' if success else 'Err')
+        log.failures
+    df = log.to_df()
+    secs = time.perf_counter() - start
+    assert len(df.index)==n and log.failures==(n + 99)//100
+    return secs
+
+
+def bench_old_dataframe_log (n):
+    """Same as bench_execution_log() with the previous DataFrame log."""
+    log = DataFrame(columns=['success', 'sql_query', 'err_info'])
+    start = time.perf_counter()
+    for i in range(n):
+        success = i%100!=0
+        row = DataFrame([{'success':success, 'sql_query':SQL.format(i, i%40),
+                          'err_info':'' if success else 'Err'}])
+        log = pd.concat([log, row], ignore_index=True)
+        len(log[log['success']==False].index)
+    return time.perf_counter() - start
+
+
+def run (sizes, old_sizes):
+    print('{:<14} {:>10} {:>10} {:>14}'.format('log', 'statements',
+                                               'seconds', 'us/statement'))
+    per_stmt = []
+    for n in sizes:
+        secs = bench_execution_log(n)
+        per_stmt.append(secs/n)
+        print('{:<14} {:>10} {:>10.3f} {:>14.2f}'.format('ExecutionLog', n,
+                                                         secs, secs/n*1e6))
+    for n in old_sizes:
+        secs = bench_old_dataframe_log(n)
+        print('{:<14} {:>10} {:>10.3f} {:>14.2f}'.format('DataFrame', n,
+                                                         secs, secs/n*1e6))
+    if len(per_stmt)>1:
+        print('ExecutionLog cost per statement at {} vs {}: {:.2f}x'.format(
+            sizes[-1], sizes[0], per_stmt[-1]/per_stmt[0]))
+
+
+def main (argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10000, 100000])
+    parser.add_argument('--old-sizes', type=int, nargs='*',
+                        default=[2000, 4000])
+    args = parser.parse_args(argv)
+    run(args.sizes, args.old_sizes)
+
+
+if __name__=='__main__':
+    main()
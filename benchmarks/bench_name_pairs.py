@@ -0,0 +1,81 @@
+"""
+Benchmark of qual_ctrl.similar_name_pairs() on synthetic player names.
+
+Times similar_name_pairs() for 5k and 20k syllable-built names and checks
+its pairs against name_edit_distances() (the brute-force nltk computation
+it replaces) for a sample of reference names.
+
+Usage:
+    python benchmarks/bench_name_pairs.py [--sizes 5000 20000]
+        [--max-dist 3] [--processes N] [--sample 20] [--seed 0]
+"""
+import argparse
+import random
+import time
+
+import dfs.db.qual_ctrl as dqc
+
+SYLLABLES = ['ka', 'ma', 'ro', 'ja', 'le', 'on', 'de', 'an', 'tre', 'vi',
+             'shi', 'mar', 'cus', 'el', 'ton', 'bri', 'ky', 'lo', 'ni', 'sa',
+             'ter', 'wil', 'son', 'go', 'ber', 'ham', 'al', 'dre', 'zo', 'ne']
+
+
+def make_names (n, seed=0):
+    """Returns n unique 'First Last' names built from 2-3 syllables each."""
+    rnd = random.Random(seed)
+
+    def word ():
+        return ''.join(rnd.choice(SYLLABLES)
+                       for _ in range(rnd.randint(2, 3))).capitalize()
+
+    names = set()
+    while len(names)<n:
+        names.add('{} {}'.format(word(), word()))
+    names = sorted(names)
+    rnd.shuffle(names)
+    return names
+
+
+def check_sample (names, pairs, max_dist, sample, seed=0):
+    """Compares pairs for `sample` reference names with the brute-force
+    name_edit_distances(). Raises AssertionError on any difference.
+    """
+    rnd = random.Random(seed)
+    by_ref = {}
+    for name1, name2, dist in pairs:
+        by_ref.setdefault(name1, set()).add((name2, dist))
+    for i in rnd.sample(range(len(names)), min(sample, len(names))):
+        expected = {(name, dist) for name, dist in
+                    dqc.name_edit_distances(names[i], names[i + 1:])
+                    if dist<=max_dist}
+        assert by_ref.get(names[i], set())==expected, names[i]
+
+
+def run (sizes, max_dist, processes, sample, seed):
+    print('{:>8} {:>10} {:>10} {:>12}'.format('names', 'pairs', 'seconds',
+                                              'names/sec'))
+    for n in sizes:
+        names = make_names(n, seed)
+        start = time.perf_counter()
+        pairs = dqc.similar_name_pairs(names, max_dist, processes)
+        secs = time.perf_counter() - start
+        print('{:>8} {:>10} {:>10.2f} {:>12.0f}'.format(n, len(pairs), secs,
+                                                       n/secs))
+        check_sample(names, pairs, max_dist, sample, seed)
+    print('Sampled results match name_edit_distances().')
+
+
+def main (argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5000, 20000])
+    parser.add_argument('--max-dist', type=int, default=3)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--sample', type=int, default=20,
+                        help='Reference names checked by brute force.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    run(args.sizes, args.max_dist, args.processes, args.sample, args.seed)
+
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Benchmark of the scrape_utils HTML parsing backends on box-score pages.
+
+Compares, for extracting one stats table from a page:
+    * make_soup(html, 'html.parser') (full tree)
+    * make_soup(html, 'lxml') (full tree)
+    * make_soup(html, 'lxml', only=('table', {'id':...})) (strained)
+    * read_html_table(html, {'id':...}) (no tree)
+and checks every backend extracts the same cell text.
+
+Pages are synthetic (modelled on basketball-reference box scores: nav,
+scripts, several stats tables and comments) unless saved pages are passed
+with --paths, in which case --table-id must name a table they contain.
+
+Usage:
+    python benchmarks/bench_parsers.py [--repeat 20] [--paths page.html ...]
+        [--table-id box-BOS-game-basic]
+"""
+import argparse
+import random
+import time
+
+import dfs.utils.scrape_utils as usu
+
+STATS = ['MP', 'FG', 'FGA', 'FG%', '3P', '3PA', '3P%', 'FT', 'FTA', 'FT%',
+         'ORB', 'DRB', 'TRB', 'AST', 'STL', 'BLK', 'TOV', 'PF', 'PTS', '+/-']
+TEAMS = ['BOS', 'CLE', 'GSW', 'HOU', 'LAL', 'MIA', 'OKC', 'SAS']
+
+
+def make_box_score_page (seed=0, teams=('BOS', 'CLE'), players=15):
+    """Returns HTML of a synthetic box-score page with basic & advanced
+    tables for two teams plus page chrome.
+    """
+    rnd = random.Random(seed)
+    parts = ['<!DOCTYPE html><html><head><title>Box Score</title>']
+    parts += ['<script>var x{} = {};</script>'.format(i, i) for i in range(30)]
+    parts.append('</head><body><div id="nav"><ul>')
+    parts += ['<li><a href="/teams/{0}/">{0}</a></li>'.format(t)
+              for t in TEAMS*10]
+    parts.append('</ul></div>')
+    for team in teams:
+        for kind in ('basic', 'advanced'):
+            table_id = 'box-{}-game-{}'.format(team, kind)
+            parts.append('<div class="table_wrapper"><table class="sortable '
+                         'stats_table" id="{}"><thead>'.format(table_id))
+            parts.append('<tr class="over_header"><th colspan="2"></th>'
+                         '<th colspan="{}">Box Score Stats</th></tr>'
+                         .format(len(STATS) - 1))
+            parts.append('<tr><th>Starters</th>{}</tr></thead><tbody>'.format(
+                ''.join('<th>{}</th>'.format(s) for s in STATS)))
+            for p in range(players):
+                if p==5:
+                    parts.append('<tr class="thead"><th>Starters</th>{}</tr>'
+                                 .format(''.join('<th>{}</th>'.format(s)
+                                                 for s in STATS)))
+                cells = ''.join('<td data-stat="{}">{}</td>'.format(
+                    s, rnd.randint(0, 40)) for s in STATS)
+                parts.append('<tr><th><a href="/players/p{0}.html">Player&nbsp;'
+                             '{0}</a></th>{1}</tr>'.format(p, cells))
+            parts.append('</tbody></table></div>')
+            parts.append('<!-- <div class="placeholder">{}</div> -->'.format(
+                'x'*500))
+    parts.append('<div id="footer">{}</div></body></html>'.format(
+        '<p>Footer text.</p>'*200))
+    return ''.join(parts)
+
+
+def soup_table_rows (soup, table_id):
+    table = soup.find('table', {'id':table_id})
+    rows = []
+    for tr in table.find_all('tr'):
+        cells = []
+        for cell in tr.find_all(['th', 'td']):
+            text = usu.clean_html(cell.get_text().replace('\xa0', ' '))
+            cells.extend([text]*int(cell.get('colspan', 1)))
+        rows.append(cells)
+    return rows
+
+
+def df_table_rows (df):
+    return [list(df.columns)] + df.values.tolist()
+
+
+def run (pages, table_id, repeat):
+    attrs = {'id':table_id}
+    backends = [
+        ('html.parser', lambda html:usu.make_soup(html, 'html.parser')),
+        ('lxml', lambda html:usu.make_soup(html, 'lxml')),
+        ('lxml + only', lambda html:usu.make_soup(html, 'lxml',
+                                                 only=('table', attrs))),
+        ('read_html_table', lambda html:usu.read_html_table(html, attrs))]
+
+    # All backends must agree on the table's (header + body) cells.
+    expected = None
+    for name, parse in backends:
+        for html in pages:
+            res = parse(html)
+            if name=='read_html_table':
+                rows = df_table_rows(res)
+            else:
+                rows = soup_table_rows(res, table_id)
+                # Soups keep the over header & repeated header rows.
+                header = rows[1]
+                rows = [header] + [r for r in rows[2:] if r!=header]
+            if expected is None:
+                expected = rows
+            assert rows==expected, name
+            break
+
+    kb = sum(len(p) for p in pages)/1024
+    print('{} page(s), {:.0f} KB total, {} repeats'.format(len(pages), kb,
+                                                           repeat))
+    print('{:<16} {:>12} {:>10}'.format('backend', 'ms/page', 'speedup'))
+    base = None
+    for name, parse in backends:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for html in pages:
+                parse(html)
+        ms = (time.perf_counter() - start)*1000/(repeat*len(pages))
+        base = base or ms
+        print('{:<16} {:>12.2f} {:>9.1f}x'.format(name, ms, base/ms))
+
+
+def main (argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--paths', nargs='*', default=None)
+    parser.add_argument('--table-id', default=None)
+    parser.add_argument('--pages', type=int, default=5,
+                        help='Synthetic pages to generate.')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+    if args.paths:
+        if args.table_id is None:
+            parser.error('--table-id is required with --paths.')
+        pages = []
+        for path in args.paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                pages.append(f.read())
+        table_id = args.table_id
+    else:
+        pages = [make_box_score_page(seed) for seed in range(args.pages)]
+        table_id = args.table_id or 'box-BOS-game-basic'
+    run(pages, table_id, args.repeat)
+
+
+if __name__=='__main__':
+    main()
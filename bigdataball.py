@@ -6,12 +6,15 @@ General steps:
 *   INSERT playerstats into database.
 *   UPDATE playerstats with tsid & starter.
 """
+from contextlib import closing, contextmanager
 import datetime
+import hashlib
+import json
 
 import dfs
 import dfs.db.qual_ctrl as dqc
-import dfs.utils.data_utils as udu
 import dfs.utils.db as udb
+import dfs.utils.io as uio
 import dfs.utils.main as dfm
 import os.path
 import pandas as pd
@@ -25,17 +28,42 @@ log._start_ud_pre_txt = ''
 SEASON = 2018
 
 team_conversion = dfm.create_team_mapping('short_name', 'nba_code')
-name_converter = dqc.NameConverter()
+_name_converter = None
 
 
-def convert_name (name):
+def get_name_converter (db=None):
+    """Returns the module's NameConverter, building it on first use.
+
+    Args:
+        db (DBWrapper): Optional. Open session (e.g. from a DBPool) used to
+        load known names if the converter has not been built yet.
+    """
+    global _name_converter
+    if _name_converter is None:
+        _name_converter = dqc.NameConverter(db=db)
+    return _name_converter
+
+
+def convert_name (name, db=None):
     try:
-        return name_converter.clean(name)
+        return get_name_converter(db).clean(name)
     except:
         print('Warning: convert_name() failed to convert {}.'.format(name))
         return name
 
 
+def convert_names (names, db=None):
+    """Same as applying convert_name() to every element of names Series but
+    each distinct name is only resolved once.
+    """
+    name_converter = get_name_converter(db)
+    already_unhandled = set(name_converter.unhandled_names)
+    result = name_converter.clean_series(names)
+    for name in name_converter.unhandled_names - already_unhandled:
+        print('Warning: convert_names() failed to convert {}.'.format(name))
+    return result
+
+
 #####################################################################
 
 class CriticalDBError(Exception):
@@ -70,18 +98,183 @@ def calc_fdp (row):
     return s
 
 
+def read_feed (path, min_gd, max_gd):
+    """Reads BigDataBall feed workbook rows with DATE in (min_gd, max_gd].
+
+    Notes:
+        Each feed workbook is parsed once and cached as Parquet (keyed on
+        path, mtime and size) so later runs only read the date window.
+    """
+    filters = [('DATE', '>', pd.Timestamp(min_gd)),
+               ('DATE', '<=', pd.Timestamp(max_gd))]
+    return uio.read_excel_cached(path, date_cols=['DATE'], filters=filters)
+
+
+def read_feed_incremental (path, cursor, min_gd, max_gd):
+    """Reads BigDataBall feed workbook rows with DATE in (min_gd, max_gd],
+    streaming the workbook from the row recorded in cursor.
+
+    Notes:
+        Feeds are cumulative and sorted by date so rows before the cursor's
+        offset have already been processed. Reading stops at the first row
+        dated after max_gd. If the row at the offset doesn't match the
+        cursor (e.g., a new season's feed), the whole feed is streamed.
+        cursor.pending is set to the position to save once the rows have
+        been committed. The header, stored dimensions and rows are all read
+        through a single read-only workbook handle.
+    """
+    with uio.open_excel_wks(path) as wks:
+        header = list(uio.iter_wks_rows(wks, max_row=1))[0]
+        columns = [col if col is not None else 'Unnamed: {}'.format(i)
+                   for i, col in enumerate(header)]
+        date_idx = columns.index('DATE')
+        min_gd, max_gd = pd.Timestamp(min_gd), pd.Timestamp(max_gd)
+
+        first_row = cursor.first_row(min_gd)
+        if wks.max_row is not None and first_row>wks.max_row:
+            # Feed has fewer rows than the cursor (e.g., a stale cursor).
+            first_row = 2
+        rows = _read_feed_rows(wks, first_row, date_idx, max_gd,
+                               len(columns))
+        if first_row>2 and (not rows or rows[0][date_idx]!=cursor.last_gd):
+            first_row = 2
+            rows = _read_feed_rows(wks, first_row, date_idx, max_gd,
+                                   len(columns))
+
+    df = pd.DataFrame(rows, columns=columns).infer_objects()
+    if df['DATE'].notnull().any():
+        # Next run restarts at the first row of the latest date read.
+        last_gd = df['DATE'].max()
+        position = int((df['DATE']==last_gd).values.argmax())
+        cursor.pending = (first_row - 2 + position, last_gd)
+    return df[(df['DATE']>min_gd) & (df['DATE']<=max_gd)]
+
+
+def _read_feed_rows (wks, first_row, date_idx, max_gd, width):
+    """Streams feed rows of open worksheet wks from first_row until a row is
+    dated after max_gd. DATE values are converted to Timestamps (NaT if
+    blank).
+    """
+    rows = []
+    with closing(uio.iter_wks_rows(wks, first_row, max_col=width,
+                                   chunk_size=1000)) as chunks:
+        for chunk in chunks:
+            for row in chunk:
+                row[date_idx] = pd.Timestamp(row[date_idx])
+                if row[date_idx]>max_gd:
+                    return rows
+                rows.append(row)
+    return rows
+
+
+# Local (not synced) folder holding feed cursors.
+FEED_STATE_DIR = os.path.join(os.path.dirname(uio.EXCEL_CACHE_DIR),
+                              'bigdataball')
+
+
+def latest_feed_path (folder, prefix, desc):
+    """Returns path of the latest '{prefix}MM-DD-YYYY.xlsx' feed in folder,
+    looking back up to 15 days from today.
+    """
+    for i in range(15):
+        dt = pd.to_datetime('today') - pd.Timedelta(days=i)
+        path = '{}{}{}.xlsx'.format(folder, prefix, dt.strftime('%m-%d-%Y'))
+        if os.path.isfile(path):
+            return path
+    raise FileNotFoundError('Unable to find latest {}.'.format(desc))
+
+
+class FeedCursor:
+    """Persisted position of the rows of a BigDataBall feed that have already
+    been added to the database.
+
+    Notes:
+        Cursors are saved in state_dir (outside the synced feed folders) and
+        keyed on the feed's folder and file name without its date stamp, so
+        successive daily feeds share a cursor.
+
+    Args:
+        feed_path (str): Path of (any dated version of) the feed workbook.
+        state_dir (str): Optional. Defaults to FEED_STATE_DIR.
+
+    Attributes:
+        path (str): JSON file in which cursor is saved.
+        rows (int): Number of data rows (excluding header) known to be in the
+        database.
+        last_gd (Timestamp): Latest game date processed.
+        pending (tuple): (rows, last_gd) to save once new rows are committed.
+    """
+
+    def __init__ (self, feed_path, state_dir=None):
+        state_dir = state_dir or FEED_STATE_DIR
+        os.makedirs(state_dir, exist_ok=True)
+        stem = uio.undated_file_stem(feed_path)
+        key = os.path.join(os.path.dirname(os.path.abspath(feed_path)), stem)
+        digest = hashlib.md5(key.encode('utf-8')).hexdigest()[:12]
+        self.path = os.path.join(state_dir,
+                                 '{}-{}_cursor.json'.format(stem, digest))
+        self.rows = 0
+        self.last_gd = None
+        self.pending = None
+        if os.path.isfile(self.path):
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self.rows = data['rows']
+            self.last_gd = pd.Timestamp(data['last_gd'])
+
+    def first_row (self, min_gd):
+        """Returns worksheet row from which to resume reading the feed.
+
+        The saved offset is only used if the database already contains the
+        cursor's last game date (i.e., min_gd >= last_gd).
+        """
+        if self.last_gd is None or min_gd is None or self.last_gd>min_gd:
+            return 2
+        return self.rows + 2
+
+    def save (self):
+        """Persists pending position (if any)."""
+        if self.pending is None:
+            return
+        self.rows, self.last_gd = self.pending
+        self.pending = None
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'rows':self.rows, 'last_gd':self.last_gd.isoformat()},
+                      f)
+        os.replace(tmp_path, self.path)
+
+
+def create_schema (stats):
+    """Maps each database column of a NewTStats / NewPStats instance to the
+    DT used to bind or format its values.
+    """
+    schema = {}
+    for cols, dtype in [(stats.COLS_NUMERIC, udb.DT.NUMBER),
+                        (stats.COLS_STR, udb.DT.STR),
+                        (stats.COLS_BOOL, udb.DT.BOOL),
+                        (stats.COLS_DATE, udb.DT.DATE)]:
+        for col in cols:
+            schema[col] = dtype
+    return schema
+
+
 #####################################################################
 
 class NewTStats:
-    """Produces sql queries used to update teamstats.
+    """Produces new rows to be inserted into teamstats.
 
     Attributes:
         df (DataFrame): Stores get_final data once it has been formatted. Only
-        initialized with a call to create_queries().
+        initialized with a call to create_insert_df().
         min_gd (datetime.datetime): Earliest game date we care about from
         bigdataball (exclusive).
         max_gd (datetime.datetime): Latest game date we care about from
         bigdataball (inclusive).
+        cursor (FeedCursor): Optional. If provided, the feed is read
+        incrementally from the cursor's position.
+        db (DBWrapper): Optional. Open session used to load the names known
+        to the NameConverter.
     """
 
     # Database columns by type.
@@ -97,14 +290,13 @@ class NewTStats:
                 'start1', 'start2', 'start3', 'start4', 'start5', 'team']
     COLS_BOOL = ['home', 'playoff']
     COLS_DATE = ['gd']
-    # Columns we'll need to "clean" before inserting into sql query.
-    COLS_CLEAN_STR = ['ref_crew1', 'ref_crew2', 'ref_main', 'restdays',
-                      'start1', 'start2', 'start3', 'start4', 'start5']
 
-    def __init__ (self, min_gd, max_gd):
+    def __init__ (self, min_gd, max_gd, cursor=None, db=None):
         self.df = None
         self.min_gd = min_gd
         self.max_gd = max_gd
+        self.cursor = cursor
+        self.db = db
 
     @staticmethod
     def _create_gid (row):
@@ -120,23 +312,21 @@ class NewTStats:
         return create_gid(gd, home_tm, away_tm)
 
     @staticmethod
-    def _load_new_raw_tstats ():
-        """Loads raw team feed from Dropbox excel file into DF."""
-
-        def get_filename ():
-            """Creates expected file name using today's date going days back."""
-            for i in range(15):
-                td = pd.Timedelta(days=i)
-                dt = pd.to_datetime('today') - td
-                txt = dt.strftime('%m-%d-%Y')
-                path = '{}{}{}.xlsx'.format(dfs.Folders.DropboxTeam,
-                                            'season-team-feed-', txt)
-                if os.path.isfile(path):
-                    return path
-            raise FileNotFoundError('Unable to find latest team feed.')
-
-        path = get_filename()
-        return pd.read_excel(path)
+    def feed_path ():
+        """Returns path of the latest team feed workbook."""
+        return latest_feed_path(dfs.Folders.DropboxTeam, 'season-team-feed-',
+                                'team feed')
+
+    @staticmethod
+    def _load_new_raw_tstats (min_gd, max_gd, cursor=None):
+        """Loads raw team feed from Dropbox excel file into DF, keeping only
+        rows with game dates in (min_gd, max_gd].
+        """
+
+        path = NewTStats.feed_path()
+        if cursor is not None:
+            return read_feed_incremental(path, cursor, min_gd, max_gd)
+        return read_feed(path, min_gd, max_gd)
 
     @staticmethod
     def _update_ref_flds (df):
@@ -171,7 +361,8 @@ class NewTStats:
         return df
 
     def _get_new_formatted_tstats (self):
-        df = self._load_new_raw_tstats()
+        df = self._load_new_raw_tstats(self.min_gd, self.max_gd,
+                                       self.cursor)
         df.rename(columns={'DATASET':'playoff', 'DATE':'gd', 'TEAMS':'team',
                            'VENUE':'home', '1Q':'q1pts', '2Q':'q2pts',
                            '3Q':'q3pts',
@@ -211,7 +402,7 @@ class NewTStats:
         df = self._update_ref_flds(df)
         # Update starter names.
         for starter_field in ['start1', 'start2', 'start3', 'start4', 'start5']:
-            df[starter_field] = df[starter_field].apply(convert_name)
+            df[starter_field] = convert_names(df[starter_field], self.db)
 
         ##################################################
         # Ensure proper dtypes.
@@ -228,37 +419,15 @@ class NewTStats:
             df[col] = df[col].astype(float)
         return df
 
-    def _create_row_sql (self, row):
-        """Creates SQL query needed to insert a new tstats row into database."""
-        field_vals = []
-        for col in self.COLS_NUMERIC:
-            fv = udb.FieldValue(col, row[col], dtype=udb.DT.NUMBER)
-            field_vals.append(fv)
-        for col in self.COLS_STR:
-            fv = udb.FieldValue(col, row[col], dtype=udb.DT.STR)
-            field_vals.append(fv)
-        for col in self.COLS_BOOL:
-            fv = udb.FieldValue(col, row[col], dtype=udb.DT.BOOL)
-            field_vals.append(fv)
-        for col in self.COLS_DATE:
-            fv = udb.FieldValue(col, row[col], dtype=udb.DT.DATE)
-            field_vals.append(fv)
-        return udb.create_insert_query(field_vals, 'teamstats')
-
-    def create_queries (self):
-        """Prepares list of SQL queries to update teamstats with new data."""
-        df = self._get_new_formatted_tstats()
-        self.df = df
-        # Ensure player name strings properly formatted.
-        for fld in self.COLS_CLEAN_STR:
-            df[fld] = df[fld].apply(udb.clean_str_for_sql)
-        # Compile queries.
-        df['sql'] = df.apply(self._create_row_sql, axis=1)
-        queries = df['sql'].tolist()
-        return queries
+    def create_insert_df (self):
+        """Prepares DataFrame of new teamstats rows to be inserted with
+        DBWrapper.bulk_insert().
+        """
+        self.df = self._get_new_formatted_tstats()
+        return self.df
 
     def date_range (self):
-        """Produces tuple with information on game dates spanned by sql queries.
+        """Produces tuple with information on game dates spanned by new rows.
 
         Returns:
             num_dates (int): Number of unique game dates in data.
@@ -273,15 +442,19 @@ class NewTStats:
 
 
 class NewPStats:
-    """Produces sql queries used to update playerstats.
+    """Produces new rows to be inserted into playerstats.
 
     Attributes:
         df (DataFrame): Stores get_final data once it has been formatted. Only
-        initialized with a call to create_queries().
+        initialized with a call to create_insert_df().
         min_gd (datetime.datetime): Earliest game date we care about from
         bigdataball (exclusive).
         max_gd (datetime.datetime): Latest game date we care about from
         bigdataball (inclusive).
+        cursor (FeedCursor): Optional. If provided, the feed is read
+        incrementally from the cursor's position.
+        db (DBWrapper): Optional. Open session used to load the names known
+        to the NameConverter.
     """
 
     COLS_INT = ['ast', 'blk', 'dreb', 'fg2a', 'fg2m', 'fg3a', 'fg3m', 'fta',
@@ -291,12 +464,13 @@ class NewPStats:
     COLS_STR = ['player', 'pos', 'team', 'opp', 'gid']
     COLS_BOOL = ['home', 'playoff']
     COLS_DATE = ['gd']
-    COLS_CLEAN_STR = ['player']
 
-    def __init__ (self, min_gd, max_gd):
+    def __init__ (self, min_gd, max_gd, cursor=None, db=None):
         self.df = None
         self.min_gd = min_gd
         self.max_gd = max_gd
+        self.cursor = cursor
+        self.db = db
 
     @staticmethod
     def _create_gid (grp):
@@ -314,28 +488,25 @@ class NewPStats:
         return grp
 
     @staticmethod
-    def _load_new_raw_pstats ():
-        """Loads raw player feed from Dropbox excel file into DF."""
-
-        def get_filename ():
-            """Creates expected file name using today's date. Loops backwards
-            in time if no matching file is found for today's date.
-            """
-            for i in range(15):
-                timedelta = pd.Timedelta(days=i)
-                dt = pd.to_datetime('today') - timedelta
-                date_str = dt.strftime('%m-%d-%Y')
-                path = '{}{}{}.xlsx'.format(dfs.Folders.DropboxPlayer,
-                                            'season-player-feed-', date_str)
-                if os.path.isfile(path):
-                    return path
-            raise FileNotFoundError('Unable to find latest player feed.')
-
-        path = get_filename()
-        return pd.read_excel(path)
+    def feed_path ():
+        """Returns path of the latest player feed workbook."""
+        return latest_feed_path(dfs.Folders.DropboxPlayer,
+                                'season-player-feed-', 'player feed')
+
+    @staticmethod
+    def _load_new_raw_pstats (min_gd, max_gd, cursor=None):
+        """Loads raw player feed from Dropbox excel file into DF, keeping only
+        rows with game dates in (min_gd, max_gd].
+        """
+
+        path = NewPStats.feed_path()
+        if cursor is not None:
+            return read_feed_incremental(path, cursor, min_gd, max_gd)
+        return read_feed(path, min_gd, max_gd)
 
     def _get_new_formatted_pstats (self):
-        df = self._load_new_raw_pstats()
+        df = self._load_new_raw_pstats(self.min_gd, self.max_gd,
+                                       self.cursor)
         df.rename(columns={'DATA SET':'playoff', 'DATE':'gd',
                            'PLAYER FULL NAME':'player', 'POSITION':'pos',
                            'OWN TEAM':'team', 'OPP TEAM':'opp',
@@ -361,7 +532,7 @@ class NewPStats:
         # Add game id.
         df = df.groupby(['gd', 'team']).apply(self._create_gid)
         # Update player names.
-        df['player'] = df['player'].apply(convert_name)
+        df['player'] = convert_names(df['player'], self.db)
         ##################################################
         # Ensure proper dtypes.
         ##################################################
@@ -371,37 +542,15 @@ class NewPStats:
             df[col] = df[col].astype(float)
         return df
 
-    def _create_row_sql (self, row):
-        """Creates SQL needed to insert a new pstats data row into db."""
-        # Create list of field names/values.
-        field_vals = []
-        for col in self.COLS_NUMERIC:
-            fv = udb.FieldValue(col, row[col], dtype=udb.DT.NUMBER)
-            field_vals.append(fv)
-        for col in self.COLS_STR:
-            field_val = udb.FieldValue(col, row[col], dtype=udb.DT.STR)
-            field_vals.append(field_val)
-        for col in self.COLS_BOOL:
-            field_val = udb.FieldValue(col, row[col], dtype=udb.DT.BOOL)
-            field_vals.append(field_val)
-        for col in self.COLS_DATE:
-            field_val = udb.FieldValue(col, row[col], dtype=udb.DT.DATE)
-            field_vals.append(field_val)
-        return udb.create_insert_query(field_vals, 'playerstats')
-
-    def create_queries (self):
-        """Prepares list of SQL queries to update playerstats with new data."""
-        df = self._get_new_formatted_pstats()
-        self.df = df
-        # Ensure player name strings properly formatted.
-        for fld in self.COLS_CLEAN_STR:
-            df[fld] = df[fld].apply(udb.clean_str_for_sql)
-        df['sql'] = df.apply(self._create_row_sql, axis=1)
-        queries = df['sql'].tolist()
-        return queries
+    def create_insert_df (self):
+        """Prepares DataFrame of new playerstats rows to be inserted with
+        DBWrapper.bulk_insert().
+        """
+        self.df = self._get_new_formatted_pstats()
+        return self.df
 
     def date_range (self):
-        """Produces tuple with information on game dates spanned by sql queries.
+        """Produces tuple with information on game dates spanned by new rows.
 
         Returns:
             num_dates (int): Number of unique game dates in data.
@@ -418,54 +567,101 @@ class NewPStats:
         return num_dates, min_date, max_date
 
 
+def _query_df (db, sql):
+    """Returns result of sql as DataFrame, through db's query cache if db is
+    a DBWrapper or straight from the connection if it is a
+    pyodbc.Connection (as was accepted before DBWrapper was required).
+    """
+    if hasattr(db, 'query_df'):
+        return db.query_df(sql)
+    return pd.read_sql(sql, db)
+
+
 class PStatsTSIDUpdate:
     """Adds tsid to playerstats rows with a NULL tsid.
 
     Attributes:
+        season (int): Season for the statistics being updated.
         pstats (DataFrame): Rows of playerstats that need to be updated.
         tstats (DataFrame): Copy of teamstats from which to figure out the tsid.
 
     Args:
-        db_conn (pyodbc.Connection): Used to create DataFrames.
+        db (DBWrapper): Used to create DataFrames (through its query cache,
+        if it has one). A pyodbc.Connection is also accepted, in which case
+        DataFrames are read directly from it without caching.
         season (int): Optional, defaults to module-level `SEASON` variable.
         Specifies the season for the statistics we want to update.
     """
 
-    def __init__ (self, db_conn, season=None):
+    def __init__ (self, db, season=None):
         """Inits copies of pstats and tstats."""
         # Form sql queries to load playerstats & teamstats.
         if not season:
             season = SEASON
+        self.season = season
         psql = 'SELECT * FROM playerstats WHERE season = {} AND ' \
                'tsid IS NULL'.format(season)
         tsql = 'SELECT * FROM teamstats WHERE season = {}'.format(season)
         # Load DataFrames.
-        self.pstats = pd.read_sql(psql, db_conn)
-        self.tstats = pd.read_sql(tsql, db_conn)
+        self.pstats = _query_df(db, psql)
+        self.tstats = _query_df(db, tsql)
 
-    def create_queries (self):
+    def create_queries (self, set_based=True):
+        """Prepares list of SQL queries to update playerstats tsid.
+
+        Args:
+            set_based (bool): Optional, default True. If True, a single
+            UPDATE joining playerstats to teamstats on (gid, team) is
+            returned. If False, one UPDATE per tsid is returned.
+        """
         s = []
         if len(self.pstats.index)==0:
             return s
 
-        for (gid, team), grp in self.pstats.groupby(['gid', 'team']):
-            s.append(self._create_sql_tsid(gid, team, grp))
+        # Raises CriticalDBError if any group lacks a tstats match.
+        df = self._merge_tsid()
+        if set_based:
+            s.append(self._create_sql_tsid_join())
+            return s
+
+        for tsid, grp in df.groupby('tsid_match'):
+            s.append(self._create_sql_tsid(tsid, grp['id'].tolist()))
 
         return s
 
-    def _get_tsid (self, gid, team):
-        """Returns ID linking tstats to team / gid group from pstats_data."""
-        game = udu.filter_df(self.tstats, {'gid':[gid], 'team':[team]})
-        try:
-            return game.iloc[0]['id']
-        except IndexError:
-            raise CriticalDBError('Failed to find tstats record match for: '
-                                  '\ngid: {}\nteam: {}'.format(gid, team))
-
-    def _create_sql_tsid (self, gid, team, grp):
-        """Returns tsid UPDATE query to be applied to a team / gid group."""
-        tsid = self._get_tsid(gid, team)
-        rids = grp['id'].tolist()
+    def _merge_tsid (self):
+        """Returns pstats ids with the id of the tstats record sharing the
+        same gid & team (as 'tsid_match').
+        """
+        tstats = self.tstats[['id', 'gid', 'team']]
+        tstats = tstats.drop_duplicates(['gid', 'team'])
+        tstats = tstats.rename(columns={'id':'tsid_match'})
+        df = self.pstats[['id', 'gid', 'team']].merge(tstats, how='left',
+                                                      on=['gid', 'team'])
+        missing = df[df['tsid_match'].isnull()]
+        if len(missing.index)>0:
+            row = missing.iloc[0]
+            raise CriticalDBError('_merge_tsid',
+                                  'Failed to find tstats record match for: '
+                                  '\ngid: {}\nteam: {}'.format(row['gid'],
+                                                                row['team']))
+        df['tsid_match'] = df['tsid_match'].astype(int)
+        return df
+
+    def _create_sql_tsid_join (self):
+        """Returns single UPDATE setting tsid for all of season's playerstats
+        rows with a NULL tsid.
+        """
+        return 'UPDATE playerstats INNER JOIN teamstats ' \
+               'ON (playerstats.gid = teamstats.gid ' \
+               'AND playerstats.team = teamstats.team) ' \
+               'SET playerstats.tsid = teamstats.id ' \
+               'WHERE playerstats.season = {} ' \
+               'AND playerstats.tsid IS NULL'.format(self.season)
+
+    @staticmethod
+    def _create_sql_tsid (tsid, rids):
+        """Returns tsid UPDATE query to be applied to playerstats ids."""
         in_clause = udb.create_sql_in_clause(rids)
         return 'UPDATE playerstats SET tsid = {} ' \
                'WHERE playerstats.id {}'.format(tsid, in_clause)
@@ -476,48 +672,51 @@ class PStatsStarterUpdate:
     players flagged as being starters.
 
     Attributes:
-        pstats_data (list of tuple): (gid, team, grp) for each game/team
-            GroupBy that needs to be updated with starters.
+        pstats_data (DataFrame): Rows of playerstats belonging to game/team
+            groups that need to be updated with starters.
         tstats (DataFrame): Copy of teamstats.
     """
 
-    def __init__ (self, db_conn):
+    # Max number of ids included in the IN clause of a single UPDATE.
+    CHUNK_SIZE = 500
+    COLS_STARTERS = ['start1', 'start2', 'start3', 'start4', 'start5']
+
+    def __init__ (self, db):
         """Inits pstats_data and tstats.
 
         Args:
-            db_conn (pyodbc.Connection): Used to create DataFrames.
+            db (DBWrapper): Used to create DataFrames (through its query
+            cache, if it has one). A pyodbc.Connection is also accepted.
         """
-        self.pstats_data = self._get_pstats_needing_starters(db_conn)
-        self.tstats = pd.read_sql(
-              'SELECT * FROM teamstats WHERE season = {}'.format(SEASON),
-              db_conn)
+        self.pstats_data = self._get_pstats_needing_starters(db)
+        self.tstats = _query_df(
+              db, 'SELECT * FROM teamstats WHERE season = {}'.format(SEASON))
 
     @staticmethod
-    def _get_pstats_needing_starters (db_conn):
-        df = pd.read_sql(
-              'SELECT * FROM playerstats WHERE season = {}'.format(SEASON),
-              db_conn)
-        relevant_grps = []
-        for (gid, team), grp in df.groupby(['gid', 'team']):
-            starter_count = len(grp[grp['starter']==True].index)
-            if starter_count==0:
-                relevant_grps.append((gid, team, grp))
-        return relevant_grps
+    def _get_pstats_needing_starters (db):
+        df = _query_df(
+              db, 'SELECT id, gid, team, player, starter FROM playerstats '
+              'WHERE season = {}'.format(SEASON))
+        is_starter = (df['starter']==True).astype(int)
+        starter_count = is_starter.groupby([df['gid'], df['team']]) \
+            .transform('sum')
+        return df[starter_count==0]
 
     def create_queries (self):
+        if self.no_new_data:
+            return []
+        # One row per (gid, team, player) listed as a starter in tstats.
+        starters = self.tstats.melt(id_vars=['gid', 'team'],
+                                    value_vars=self.COLS_STARTERS,
+                                    value_name='player')
+        starters = starters[['gid', 'team', 'player']].drop_duplicates()
+        df = self.pstats_data.merge(starters, on=['gid', 'team', 'player'])
+        starter_ids = df['id'].drop_duplicates().tolist()
+
         s = []
-        for (gid, team, grp) in self.pstats_data:
-            # Get list of starters from tstats for this team/game.
-            tstats = udu.filter_df(self.tstats, {'gid':[gid], 'team':[team]},
-                                   as_series=True)
-            starters = [tstats['start1'], tstats['start2'], tstats['start3'],
-                        tstats['start4'], tstats['start5']]
-            # Create field on pstats group to determine if player started.
-            is_starter = lambda x:x['player'] in starters
-            grp['started'] = grp.apply(is_starter, axis=1)
-            grp = grp[grp['started']==True]
-            starter_ids = grp['id'].tolist()
-            s.append(self._create_sql_update_query(starter_ids))
+        for i in range(0, len(starter_ids), self.CHUNK_SIZE):
+            chunk = starter_ids[i:i + self.CHUNK_SIZE]
+            s.append(self._create_sql_update_query(chunk))
         return s
 
     @staticmethod
@@ -529,7 +728,7 @@ class PStatsStarterUpdate:
     @property
     def no_new_data (self):
         """Returns True if there is no data needing to be updated."""
-        return len(self.pstats_data)==0
+        return len(self.pstats_data.index)==0
 
 
 #####################################################################
@@ -544,78 +743,158 @@ def create_log_path (base_file_name):
     return '{}{} {}'.format(dfs.Folders.DFExperiments, base_file_name, date_str)
 
 
-def add_new_pstats ():
-    db = dfm.create_nba_dbwrapper()
-    min_gd = db.query_scalar('SELECT MAX(gd) FROM playerstats')
-    max_gd = datetime.datetime.today()
-    queries = NewPStats(min_gd, max_gd).create_queries()
+@contextmanager
+def nba_session (pool=None):
+    """Checks out DBWrapper from pool (or from a single-use pool if None)."""
+    if pool is not None:
+        with pool.session() as db:
+            yield db
+        return
+    with udb.DBPool(dfm.create_nba_dbwrapper) as own_pool:
+        with own_pool.session() as db:
+            yield db
+
+
+def add_new_pstats (incremental=False, pool=None):
+    """Inserts new rows from latest player feed.
 
-    db_update = udb.DBUpdate(db)
-    log_path = create_log_path('DB Insert - PStats')
-    db_update.update(queries, log_path)
+    Args:
+        incremental (bool): Optional, default False. If True, the feed is
+        streamed from the position saved after the last committed run.
+        pool (DBPool): Optional. Pool from which to check out connection.
+    """
+    with nba_session(pool) as db:
+        min_gd = db.query_scalar('SELECT MAX(gd) FROM playerstats')
+        max_gd = datetime.datetime.today()
+        cursor = None
+        if incremental:
+            cursor = FeedCursor(NewPStats.feed_path())
+        new_pstats = NewPStats(min_gd, max_gd, cursor, db)
+        df = new_pstats.create_insert_df()
+        schema = create_schema(new_pstats)
+
+        db_update = udb.DBUpdate(db)
+        log_path = create_log_path('DB Insert - PStats')
+        committed = db_update.bulk_insert('playerstats', df, list(schema),
+                                          schema, log_path)
+    if cursor is not None and (committed or len(df.index)==0):
+        cursor.save()
+
+
+def add_new_tstats (incremental=False, pool=None):
+    """Inserts new rows from latest team feed.
 
+    Args:
+        incremental (bool): Optional, default False. If True, the feed is
+        streamed from the position saved after the last committed run.
+        pool (DBPool): Optional. Pool from which to check out connection.
+    """
+    with nba_session(pool) as db:
+        min_gd = db.query_scalar('SELECT MAX(gd) FROM teamstats')
+        max_gd = datetime.datetime.today()
+        cursor = None
+        if incremental:
+            cursor = FeedCursor(NewTStats.feed_path())
+        new_tstats = NewTStats(min_gd, max_gd, cursor, db)
+        df = new_tstats.create_insert_df()
+        schema = create_schema(new_tstats)
+
+        db_update = udb.DBUpdate(db)
+        log_path = create_log_path('DB Insert - TStats')
+        committed = db_update.bulk_insert('teamstats', df, list(schema),
+                                          schema, log_path)
+    if cursor is not None and (committed or len(df.index)==0):
+        cursor.save()
+
+
+def update_pstats_tsid (season=None, pool=None, batched=False):
+    """Sets tsid of playerstats rows missing one.
 
-def add_new_tstats ():
-    db = dfm.create_nba_dbwrapper()
-    min_gd = db.query_scalar('SELECT MAX(gd) FROM teamstats')
-    max_gd = datetime.datetime.today()
-    queries = NewTStats(min_gd, max_gd).create_queries()
+    Args:
+        season (int): Optional, defaults to `SEASON`.
+        pool (DBPool): Optional. Pool from which to check out connection.
+        batched (bool): Optional, default False. If True, the updates are
+        committed in batches without prompting (see
+        DBUpdate.update_batched()); otherwise the user is asked whether to
+        commit if any fail.
+    """
+    with nba_session(pool) as db:
+        queries = PStatsTSIDUpdate(db, season).create_queries()
 
-    db_update = udb.DBUpdate(db)
-    log_path = create_log_path('DB Insert - TStats')
-    db_update.update(queries, log_path)
+        db_update = udb.DBUpdate(db)
+        if season:
+            log_path = create_log_path('DB Update - tsid - {}'.format(season))
+        else:
+            log_path = create_log_path('DB Update - tsid')
+        _run_update(db_update, queries, log_path, batched)
 
 
-def update_pstats_tsid (season=None):
-    db = dfm.create_nba_dbwrapper()
-    queries = PStatsTSIDUpdate(db.conn, season).create_queries()
+def update_pstats_starter (pool=None, batched=False):
+    """Flags starters in playerstats for game/team groups without any.
 
-    db_update = udb.DBUpdate(db)
-    if season:
-        log_path = create_log_path('DB Update - tsid - {}'.format(season))
-    else:
-        log_path = create_log_path('DB Update - tsid')
-    db_update.update(queries, log_path)
+    Args:
+        pool (DBPool): Optional. Pool from which to check out connection.
+        batched (bool): Optional, default False. See update_pstats_tsid().
+    """
+    with nba_session(pool) as db:
+        queries = PStatsStarterUpdate(db).create_queries()
 
+        db_update = udb.DBUpdate(db)
+        log_path = create_log_path('DB Update - starter')
+        _run_update(db_update, queries, log_path, batched)
 
-def update_pstats_starter ():
-    db = dfm.create_nba_dbwrapper()
-    queries = PStatsStarterUpdate(db.conn).create_queries()
 
-    db_update = udb.DBUpdate(db)
-    log_path = create_log_path('DB Update - starter')
-    db_update.update(queries, log_path)
+def _run_update (db_update, queries, log_path, batched):
+    if batched:
+        db_update.update_batched(queries, log_path)
+    else:
+        db_update.update(queries, log_path)
 
 
-def add_new_stats_to_db (add_pstats, add_tstats, ud_tsid, ud_starter):
-    """Central method to update database."""
-    if add_pstats:
-        log.s('Adding new PStats')
-        try:
-            add_new_pstats()
-        except FileNotFoundError as e:
-            print(str(e))
-        finally:
-            log.e(msg='')
+def add_new_stats_to_db (add_pstats, add_tstats, ud_tsid, ud_starter,
+                         incremental=False, batched=False):
+    """Central method to update database.
 
-    if add_tstats:
-        log.s('Adding new TStats')
-        try:
-            add_new_tstats()
-        except FileNotFoundError as e:
-            print(str(e))
-        finally:
-            log.e(msg='')
+    If batched is True, the tsid and starter updates are committed in
+    batches without prompting (see update_pstats_tsid()).
 
-    if ud_tsid:
-        log.s('Updating PStats tsid')
-        update_pstats_tsid()
-        log.e(msg='')
+    A single connection is shared by every stage (including loading the names
+    used by the NameConverter), as is a QueryCache so that tables read by
+    more than one stage (e.g. the season's teamstats) are only loaded once
+    unless written to in between.
+    """
+    with udb.DBPool(dfm.create_nba_dbwrapper,
+                    cache=udb.QueryCache()) as pool:
+        if add_pstats or add_tstats:
+            with pool.session() as db:
+                get_name_converter(db)
+        if add_pstats:
+            log.s('Adding new PStats')
+            try:
+                add_new_pstats(incremental, pool)
+            except FileNotFoundError as e:
+                print(str(e))
+            finally:
+                log.e(msg='')
+
+        if add_tstats:
+            log.s('Adding new TStats')
+            try:
+                add_new_tstats(incremental, pool)
+            except FileNotFoundError as e:
+                print(str(e))
+            finally:
+                log.e(msg='')
+
+        if ud_tsid:
+            log.s('Updating PStats tsid')
+            update_pstats_tsid(pool=pool, batched=batched)
+            log.e(msg='')
 
-    if ud_starter:
-        log.s('Updating PStats starter')
-        update_pstats_starter()
-        log.e(msg='')
+        if ud_starter:
+            log.s('Updating PStats starter')
+            update_pstats_starter(pool=pool, batched=batched)
+            log.e(msg='')
 
 
 if __name__=='__main__':
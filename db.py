@@ -1,8 +1,16 @@
 """
 pyodbc engine wrapper for simple methods permitting edit access to database.
 """
+from collections import OrderedDict
+from contextlib import contextmanager
 import enum
+import hashlib
+import json
+import os.path
 import pyodbc
+import re
+import threading
+import time
 from typing import Any
 
 import dfs.utils.data_utils as udu
@@ -27,6 +35,202 @@ class DBError(Exception):
         self.original_exception = original_exception
 
 
+class ExecutionLog(object):
+    """Append-only record of sql query attempts.
+
+    Notes:
+        Entries are stored in columnar lists so each append is O(1); a
+        DataFrame is only built on request through to_df().
+
+    Attributes:
+        successes (int): Number of sql queries executed successfully.
+        failures (int): Number of failed sql queries.
+    """
+
+    COLUMNS = ['success', 'sql_query', 'err_info']
+
+    def __init__ (self):
+        self._success = []
+        self._sql = []
+        self._err_info = []
+        self.successes = 0
+        self.failures = 0
+
+    def append (self, success, sql, err_details=''):
+        """Adds new record to log."""
+        self._success.append(success)
+        self._sql.append(sql)
+        self._err_info.append(err_details)
+        if success:
+            self.successes += 1
+        else:
+            self.failures += 1
+
+    def to_df (self) -> DataFrame:
+        """Returns log as DataFrame with columns COLUMNS."""
+        data = {'success':self._success, 'sql_query':self._sql,
+                'err_info':self._err_info}
+        return DataFrame(data, columns=self.COLUMNS)
+
+    def iter_dfs (self, chunk_size=10000):
+        """Yields log as consecutive DataFrames of up to chunk_size rows."""
+        for i in range(0, len(self), chunk_size):
+            data = {'success':self._success[i:i + chunk_size],
+                    'sql_query':self._sql[i:i + chunk_size],
+                    'err_info':self._err_info[i:i + chunk_size]}
+            yield DataFrame(data, columns=self.COLUMNS,
+                            index=range(i, i + len(data['success'])))
+
+    def __len__ (self):
+        return len(self._success)
+
+
+class QueryCache(object):
+    """Opt-in cache of query results for DBWrapper, keyed by normalized SQL.
+
+    Notes:
+        Results are kept in an in-memory LRU bounded by the total size of the
+        cached DataFrames and, optionally, saved as Parquet files in disk_dir
+        so they are also reused by later runs. Entries are invalidated when a
+        statement executed through the DBWrapper touches one of the tables
+        they were read from. Writes made to the database by other
+        processes are not detected, so call clear() if the data may have
+        changed between runs.
+
+    Attributes:
+        max_bytes (int): Memory budget for cached DataFrames.
+        disk_dir (str): Optional. Folder for the on-disk (Parquet) tier.
+        nbytes (int): Memory currently used by cached DataFrames.
+    """
+
+    def __init__ (self, max_bytes=256*1024**2, disk_dir=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.nbytes = 0
+        # key -> (DataFrame, tables, nbytes)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_index = {}
+        if disk_dir is not None:
+            os.makedirs(disk_dir, exist_ok=True)
+            if os.path.isfile(self._disk_index_path):
+                with open(self._disk_index_path, 'r') as f:
+                    self._disk_index = json.load(f)
+
+    @staticmethod
+    def make_key (sql, idx_col=None):
+        """Returns cache key for sql (whitespace-normalized) and idx_col."""
+        return '{}|{}'.format(' '.join(sql.split()), idx_col)
+
+    def get (self, key):
+        """Returns copy of cached DataFrame for key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[0].copy()
+        df = self._read_disk(key)
+        if df is None:
+            return None
+        self._put_memory(key, df, referenced_tables(key))
+        return df.copy()
+
+    def put (self, key, df):
+        """Caches copy of df under key."""
+        df = df.copy()
+        tables = referenced_tables(key)
+        self._put_memory(key, df, tables)
+        self._write_disk(key, df, tables)
+
+    def invalidate (self, tables):
+        """Drops every entry read from any of tables."""
+        tables = {t.lower() for t in tables}
+        if not tables:
+            return
+        with self._lock:
+            stale = [k for k, e in self._entries.items() if e[1] & tables]
+            for key in stale:
+                self.nbytes -= self._entries.pop(key)[2]
+            stale_files = [d for d, t in self._disk_index.items()
+                           if set(t) & tables]
+            for digest in stale_files:
+                del self._disk_index[digest]
+        for digest in stale_files:
+            try:
+                os.remove(self._disk_path(digest))
+            except OSError:
+                pass
+        if stale_files:
+            self._save_disk_index()
+
+    def clear (self):
+        """Drops every entry (memory and disk)."""
+        with self._lock:
+            tables = set(t for e in self._entries.values() for t in e[1])
+            for t in self._disk_index.values():
+                tables.update(t)
+        self.invalidate(tables)
+
+    def _put_memory (self, key, df, tables):
+        nbytes = int(df.memory_usage(index=True, deep=True).sum())
+        if nbytes>self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[2]
+            self._entries[key] = (df, tables, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes>self.max_bytes:
+                _, (_, _, size) = self._entries.popitem(last=False)
+                self.nbytes -= size
+
+    @property
+    def _disk_index_path (self):
+        return os.path.join(self.disk_dir, 'index.json')
+
+    def _disk_path (self, digest):
+        return os.path.join(self.disk_dir, '{}.parquet'.format(digest))
+
+    @staticmethod
+    def _digest (key):
+        return hashlib.md5(key.encode('utf-8')).hexdigest()
+
+    def _read_disk (self, key):
+        if self.disk_dir is None:
+            return None
+        digest = self._digest(key)
+        if digest not in self._disk_index:
+            return None
+        try:
+            return pd.read_parquet(self._disk_path(digest))
+        except Exception:
+            return None
+
+    def _write_disk (self, key, df, tables):
+        if self.disk_dir is None:
+            return
+        digest = self._digest(key)
+        try:
+            df.to_parquet(self._disk_path(digest))
+        except Exception:
+            # E.g. columns of mixed types; keep memory tier only.
+            return
+        with self._lock:
+            self._disk_index[digest] = sorted(tables)
+        self._save_disk_index()
+
+    def _save_disk_index (self):
+        with self._lock:
+            data = dict(self._disk_index)
+        with open(self._disk_index_path, 'w') as f:
+            json.dump(data, f)
+
+
+# Lower-cased ODBC driver (DLL) names for which fast_executemany is not used:
+# the Microsoft Access drivers.
+_NO_FAST_EXECUTEMANY_DRIVERS = ('aceodbc', 'odbcjt32')
+
+
 class DBWrapper(object):
     """Wraps pyodbc functionality to access database and perform edits.
     
@@ -38,20 +242,25 @@ class DBWrapper(object):
         conn (pyodbc.Connection): Database connection initialized with conn_str.
         cursor (pyodbc.Cursor): Database connection cursor.
         db_name (str, optional): Name for database.
-        log (DataFrame): Execution log for every sql query to track whether
-        it was successful or not.
+        log (ExecutionLog): Execution log for every sql query to track
+        whether it was successful or not.
+        cache (QueryCache, optional): If provided, results of query_df() and
+        get_table() are cached and invalidated by writes made through this
+        wrapper.
     """
 
-    def __init__ (self, conn_str, db_name=None):
+    def __init__ (self, conn_str, db_name=None, cache=None):
         """Inits Connection object using pyodbc.connect() and creates Cursor
         object with that Connection.
         """
         try:
             self.conn_str = conn_str
+            self.cache = cache
+            self._uncommitted_tables = set()
             self.conn = pyodbc.connect(conn_str, autocommit=False)
             self.cursor = self.conn.cursor()
             self.db_name = db_name
-            self.log = DataFrame(columns=['success', 'sql_query', 'err_info'])
+            self.log = ExecutionLog()
         except Exception as e:
             self.close_resources()
             raise DBError('__init__', 'Failed opening connection to database.',
@@ -66,6 +275,7 @@ class DBWrapper(object):
             query and exception is not logged; if False, no error is raised
             on failed SQL query but the exception is logged.
         """
+        self._invalidate_cache(sql)
         try:
             self.cursor.execute(sql)
             if log:
@@ -77,6 +287,104 @@ class DBWrapper(object):
             if log:
                 self._update_log(False, sql, str(e))
 
+    def bulk_insert (self, table, df, columns, dtypes=None, batch_size=1000,
+                     raise_err=False, fast_executemany=None):
+        """Inserts rows of df into table using parameterized batches sent
+        with `executemany`.
+
+        Notes:
+            Each batch is logged as a single entry in the execution log.
+            Values are bound as typed parameters so strings should NOT be
+            escaped with clean_str_for_sql() beforehand.
+
+        Args:
+            table (str): Name of table in which data is to be inserted.
+            df (DataFrame): Data to insert.
+            columns (list[str]): Columns of df to insert (also used as the
+            table's field names).
+            dtypes (dict): Optional. Maps column to DT. Columns not included
+            are bound as-is (with NaN converted to NULL).
+            batch_size (int): Optional, default 1000. Rows sent per call to
+            `executemany`.
+            raise_err (bool): If True, then DBError is raised on a failed
+            batch; if False, the failure is logged, the transaction is rolled
+            back and redone with the failed batch inserted row by row (so
+            only its bad rows are left out), and the remaining batches are
+            still sent. Since that rollback would discard uncommitted changes
+            made before this call, DBError is raised instead if there are
+            any.
+            fast_executemany (bool): Optional. Whether to use pyodbc's
+            fast_executemany. Defaults to supports_fast_executemany().
+
+        Returns:
+            rows (int): Number of rows inserted (pending commit).
+            rows_per_sec (float): Insert throughput.
+        """
+        sql = create_insert_param_query(columns, table)
+        had_pending = bool(self._uncommitted_tables)
+        self._invalidate_cache(sql)
+        params = create_insert_params(df, columns, dtypes)
+        if fast_executemany is None:
+            fast_executemany = self.supports_fast_executemany()
+        if fast_executemany:
+            self.cursor.fast_executemany = True
+        # Rows sent by batches that succeeded, replayed after a rollback.
+        inserted = []
+        start = time.time()
+        try:
+            for i in range(0, len(params), batch_size):
+                batch = params[i:i + batch_size]
+                info = '{} [rows {}-{}]'.format(sql, i, i + len(batch) - 1)
+                try:
+                    self.cursor.executemany(sql, batch)
+                    inserted.extend(batch)
+                    self._update_log(True, info, '')
+                except Exception as e:
+                    if raise_err:
+                        raise DBError(self.db_name,
+                                      'Failed to execute ' + info) from e
+                    if had_pending:
+                        raise DBError(self.db_name, 'Failed to execute {}; '
+                                      'cannot roll back partial batch '
+                                      'without losing uncommitted changes '
+                                      'made before bulk_insert().'.format(
+                                          info)) from e
+                    self._update_log(False, info, str(e))
+                    self._redo_failed_batch(sql, inserted, batch, i)
+        finally:
+            if fast_executemany:
+                self.cursor.fast_executemany = False
+        rows = len(inserted)
+        seconds = time.time() - start
+        rows_per_sec = rows/seconds if seconds>0 else float(rows)
+        return rows, rows_per_sec
+
+    def _redo_failed_batch (self, sql, inserted, batch, first_idx):
+        """Rolls back the transaction (which may hold part of the failed
+        batch), re-sends the rows in `inserted` and then inserts batch row by
+        row, logging each failed row. Rows inserted are added to `inserted`.
+        """
+        self.conn.rollback()
+        if inserted:
+            self.cursor.executemany(sql, inserted)
+        for j, row in enumerate(batch, first_idx):
+            try:
+                self.cursor.execute(sql, row)
+                inserted.append(row)
+            except Exception as e:
+                self._update_log(False, '{} [row {}]'.format(sql, j), str(e))
+
+    def supports_fast_executemany (self):
+        """Returns True unless the ODBC driver is known to mishandle pyodbc's
+        fast_executemany (e.g. the Microsoft Access driver) or cannot be
+        identified.
+        """
+        try:
+            driver = self.conn.getinfo(pyodbc.SQL_DRIVER_NAME).lower()
+        except Exception:
+            return False
+        return not any(d in driver for d in _NO_FAST_EXECUTEMANY_DRIVERS)
+
     def query_scalar (self, sql, raise_err=True) -> Any:
         """Executes sql query and returns the resulting scalar. It is assumed
         that the sql query only returns a single scalar.
@@ -84,14 +392,112 @@ class DBWrapper(object):
         self.execute(sql, raise_err, log=False)
         return self.cursor.fetchall()[0][0]
 
-    def get_table (self, table, idx_col=None) -> DataFrame:
-        """Executes SQL to retrieve all data from a table."""
-        sql = 'SELECT * FROM {}'.format(table)
-        return pd.read_sql_query(sql, self.conn, index_col=idx_col)
+    def get_table (self, table, idx_col=None, columns=None, chunksize=None,
+                   dtypes=None):
+        """Executes SQL to retrieve all data from a table.
+
+        Args:
+            table (str): Name of table.
+            idx_col (str): Optional. Column to set as index.
+            columns (list[str]): Optional. Only these columns are selected.
+            chunksize (int): Optional. If provided, an iterator of DataFrames
+            of up to chunksize rows is returned instead (see query_iter()).
+            dtypes (dict): Optional. Maps column to dtype; only used when
+            chunksize is provided.
+
+        Returns:
+            DataFrame or Iterator[DataFrame]
+        """
+        if columns is None:
+            fields = '*'
+        else:
+            fields = ', '.join(['[{}]'.format(c) if field_name_restricted(c)
+                                else c for c in columns])
+        sql = 'SELECT {} FROM {}'.format(fields, table)
+        if chunksize is None:
+            return self.query_df(sql, idx_col)
+        return self.query_iter(sql, chunksize, dtypes=dtypes, idx_col=idx_col)
+
+    def query_iter (self, sql, chunksize=10000, columns=None, dtypes=None,
+                    idx_col=None):
+        """Executes sql query and yields the results as DataFrames of up to
+        chunksize rows, fetched with `cursor.fetchmany`.
+
+        Notes:
+            A separate cursor is used so the query can be consumed while
+            other statements are executed through `cursor`. Only one chunk
+            is held in memory at a time.
+
+        Args:
+            sql (str): Query to execute.
+            chunksize (int): Optional, default 10000. Max rows per chunk.
+            columns (list[str]): Optional. Result columns to keep (projection
+            is best done in sql itself when possible).
+            dtypes (dict): Optional. Maps column (or idx_col) to dtype each
+            chunk is cast to, so chunks share consistent types. Columns not
+            in the result are ignored.
+            idx_col (str): Optional. Column to set as index of each chunk.
+
+        Yields:
+            DataFrame
+        """
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql)
+            names = [d[0] for d in cursor.description]
+            while True:
+                rows = cursor.fetchmany(chunksize)
+                if not rows:
+                    break
+                df = DataFrame.from_records([tuple(r) for r in rows],
+                                            columns=names)
+                if columns is not None:
+                    df = df[columns]
+                if idx_col is not None:
+                    df.set_index(idx_col, inplace=True)
+                if dtypes is not None:
+                    col_dtypes = {c: t for c, t in dtypes.items()
+                                  if c in df.columns}
+                    if col_dtypes:
+                        df = df.astype(col_dtypes)
+                    if idx_col in dtypes:
+                        df.index = df.index.astype(dtypes[idx_col])
+                yield df
+        finally:
+            cursor.close()
+
+    def query_df (self, sql, idx_col=None, use_cache=True):
+        """Executes sql query and returns the results in form of a DataFrame.
 
-    def query_df (self, sql, idx_col=None):
-        """Executes sql query and returns the results in form of a DataFrame."""
-        return pd.read_sql_query(sql, self.conn, index_col=idx_col)
+        Results are served from / saved to `cache` (if set) unless use_cache
+        is False, the tables read can't be identified or any of them has
+        writes not yet committed by this session.
+        """
+        if self.cache is None or not use_cache:
+            return pd.read_sql_query(sql, self.conn, index_col=idx_col)
+        tables = referenced_tables(sql, strict=True)
+        # The cache is shared with other sessions (see DBPool), so results
+        # that may include this session's uncommitted writes are neither
+        # cached nor served from it.
+        if tables is None or tables & self._uncommitted_tables:
+            return pd.read_sql_query(sql, self.conn, index_col=idx_col)
+        key = self.cache.make_key(sql, idx_col)
+        df = self.cache.get(key)
+        if df is None:
+            df = pd.read_sql_query(sql, self.conn, index_col=idx_col)
+            self.cache.put(key, df)
+        return df
+
+    def _invalidate_cache (self, sql):
+        """Records tables touched by a write as uncommitted and invalidates
+        their cached results.
+        """
+        if is_read_query(sql):
+            return
+        tables = referenced_tables(sql)
+        self._uncommitted_tables.update(tables)
+        if self.cache is not None:
+            self.cache.invalidate(tables)
 
     def _update_log (self, success, sql, err_details=''):
         """Adds new record to execution log.
@@ -101,24 +507,43 @@ class DBWrapper(object):
             sql (str): SQL query.
             err_details (str): Additional information about the error.
         """
-        row = {'success':success, 'sql_query':sql, 'err_info':err_details}
-        self.log = self.log.append(row, ignore_index=True)
+        self.log.append(success, sql, err_details)
 
     @property
     def successes (self):
         """Returns number of sql queries executed successfully."""
-        return len(self.log[self.log['success']==True].index)
+        return self.log.successes
 
     @property
     def failures (self):
         """Returns number of failed sql queries."""
-        return len(self.log[self.log['success']==False].index)
+        return self.log.failures
 
     def commit_changes (self):
         """Commits all SQL statements executed on the connection that created
         this cursor, since the last commit.
         """
         self.conn.commit()
+        self._uncommitted_tables.clear()
+
+    def rollback_changes (self):
+        """Rolls back all SQL statements executed on the connection since the
+        last commit.
+        """
+        self.conn.rollback()
+        # Results read since the writes no longer reflect the tables.
+        if self.cache is not None:
+            self.cache.invalidate(self._uncommitted_tables)
+        self._uncommitted_tables.clear()
+
+    def is_healthy (self, sql='SELECT 1'):
+        """Returns True if connection can still execute a trivial query."""
+        try:
+            self.cursor.execute(sql)
+            self.cursor.fetchall()
+            return True
+        except Exception:
+            return False
 
     def close_resources (self):
         """Closes connection and cursor, releasing memory from variables.
@@ -137,6 +562,108 @@ class DBWrapper(object):
             pass
 
 
+class DBPool(object):
+    """Hands out DBWrapper sessions over a bounded set of reusable
+    connections.
+
+    Notes:
+        Connections are checked for health when checked out and replaced if
+        broken. Uncommitted changes are always rolled back when a session
+        ends, and all connections are closed when the pool is closed.
+
+    Examples:
+        with DBPool(create_dbwrapper) as pool:
+            with pool.session() as db:
+                db.execute(sql)
+                db.commit_changes()
+
+    Attributes:
+        factory (callable): Returns a new, connected DBWrapper.
+        max_size (int): Max number of connections open at once. Checkouts
+        beyond that block until a session ends.
+        health_sql (str): Query used to check a connection on checkout.
+        cache (QueryCache): Optional. Set on every DBWrapper created by
+        factory without a cache of its own, so query results are shared
+        across sessions.
+    """
+
+    def __init__ (self, factory, max_size=1, health_sql='SELECT 1',
+                  cache=None):
+        self.factory = factory
+        self.max_size = max_size
+        self.health_sql = health_sql
+        self.cache = cache
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._closed = False
+
+    @contextmanager
+    def session (self):
+        """Checks out a DBWrapper (with a fresh execution log) for the
+        duration of the with block.
+        """
+        if self._closed:
+            raise DBError('session', 'DBPool is closed.')
+        self._slots.acquire()
+        db = None
+        try:
+            db = self._checkout()
+            yield db
+        finally:
+            if db is not None:
+                self._checkin(db)
+            self._slots.release()
+
+    def _checkout (self):
+        """Returns healthy idle DBWrapper or a new one."""
+        while True:
+            with self._lock:
+                db = self._idle.pop() if self._idle else None
+            if db is None:
+                db = self.factory()
+                if db.cache is None:
+                    db.cache = self.cache
+                break
+            if db.is_healthy(self.health_sql):
+                db.rollback_changes()
+                break
+            db.close_resources()
+        db.log = ExecutionLog()
+        return db
+
+    def _checkin (self, db):
+        """Rolls back uncommitted changes and returns db to pool (or closes
+        it if it is broken or the pool is closed).
+        """
+        try:
+            db.rollback_changes()
+        except Exception:
+            db.close_resources()
+            return
+        with self._lock:
+            if not self._closed:
+                self._idle.append(db)
+                return
+        db.close_resources()
+
+    def close (self):
+        """Closes all idle connections. Sessions still checked out are closed
+        when they end.
+        """
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for db in idle:
+            db.close_resources()
+
+    def __enter__ (self):
+        return self
+
+    def __exit__ (self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
 class DBUpdate(object):
     """Wrapper to execute sql queries on database using DBWrapper.
 
@@ -145,35 +672,200 @@ class DBUpdate(object):
         initialized once passed to constructor.
     """
 
+    # Failure policies for update_batched().
+    ON_ERROR_SKIP = 'skip'
+    ON_ERROR_RETRY = 'retry'
+    ON_ERROR_ABORT = 'abort'
+
     def __init__ (self, db):
         self.db = db
 
     def update (self, queries, log_path):
+        """Executes queries and returns True if changes were committed."""
         if len(queries)==0:
             print('List of queries to execute is empty. Aborting.')
-            return
+            return False
 
         print('Executing {} queries...'.format(len(queries)))
         for sql in queries:
             self.db.execute(sql)
 
+        return self._finalize(log_path)
+
+    def bulk_insert (self, table, df, columns, dtypes, log_path,
+                     batch_size=1000):
+        """Inserts df into table with DBWrapper.bulk_insert() and then
+        commits (or not) in the same way as update().
+
+        Returns:
+            bool: True if changes were committed.
+        """
+        if len(df.index)==0:
+            print('No rows to insert into {}. Aborting.'.format(table))
+            return False
+
+        print('Inserting {} rows into {}...'.format(len(df.index), table))
+        rows, rate = self.db.bulk_insert(table, df, columns, dtypes,
+                                         batch_size=batch_size)
+        print('Inserted {} rows ({:.0f} rows/sec).'.format(rows, rate))
+
+        return self._finalize(log_path)
+
+    def update_batched (self, queries, log_path, batch_size=500,
+                        max_seconds=None, on_error='skip', retries=3,
+                        checkpoint_path=None):
+        """Executes queries without prompting, committing every batch_size
+        statements (or every max_seconds seconds, whichever comes first).
+
+        Notes:
+            If checkpoint_path is provided, the number of queries committed
+            so far is saved there after every commit. Calling again with the
+            same queries and checkpoint_path resumes after the last
+            committed batch. The checkpoint is deleted once all queries are
+            committed. Access (through pyodbc) has no savepoints, so batches
+            are the unit of rollback: a failed statement is handled
+            according to on_error rather than rolled back on its own.
+
+        Args:
+            queries (list[str]): Queries to execute.
+            log_path (str): Where execution log is saved if any query fails.
+            batch_size (int): Optional, default 500. Max statements per
+            transaction.
+            max_seconds (float): Optional. Max seconds a transaction is kept
+            open.
+            on_error (str): Optional. ON_ERROR_SKIP logs the failed query and
+            continues. ON_ERROR_RETRY retries the query up to `retries` times
+            before aborting. ON_ERROR_ABORT rolls back the current batch and
+            raises DBError.
+            retries (int): Optional, default 3. Used with ON_ERROR_RETRY.
+            checkpoint_path (str): Optional. JSON file used to resume.
+
+        Returns:
+            int: Number of queries committed during this call.
+        """
+        if on_error not in (self.ON_ERROR_SKIP, self.ON_ERROR_RETRY,
+                            self.ON_ERROR_ABORT):
+            raise DBError('update_batched',
+                          'Unhandled on_error: {}'.format(on_error))
+        if len(queries)==0:
+            print('List of queries to execute is empty. Aborting.')
+            return 0
+
+        digest = _queries_digest(queries)
+        start = _load_checkpoint(checkpoint_path, digest)
+        if start>0:
+            print('Resuming after {} committed queries.'.format(start))
+        print('Executing {} queries...'.format(len(queries) - start))
+
+        committed = start
+        failures_before = self.db.failures
+        batch_start = time.time()
+        try:
+            for i in range(start, len(queries)):
+                self._execute_with_policy(queries[i], on_error, retries)
+                batch_len = i + 1 - committed
+                timed_out = max_seconds is not None and \
+                            time.time() - batch_start>=max_seconds
+                if batch_len>=batch_size or timed_out or i==len(queries) - 1:
+                    self.db.commit_changes()
+                    committed = i + 1
+                    _save_checkpoint(checkpoint_path, digest, committed)
+                    batch_start = time.time()
+        except DBError:
+            self.db.rollback_changes()
+            print('Aborted after {} committed queries.'.format(committed))
+            self._save_log(log_path)
+            raise
+
+        _remove_checkpoint(checkpoint_path)
+        failures = self.db.failures - failures_before
+        if failures==0:
+            print('Full success.')
+        else:
+            print('{} failed. Saving execution log.'.format(failures))
+            self._save_log(log_path)
+        return committed - start
+
+    def _execute_with_policy (self, sql, on_error, retries):
+        """Executes sql, handling a failure according to on_error."""
+        if on_error==self.ON_ERROR_SKIP:
+            self.db.execute(sql)
+            return
+        attempts = retries + 1 if on_error==self.ON_ERROR_RETRY else 1
+        for attempt in range(attempts):
+            try:
+                self.db.execute(sql, raise_err=True, log=False)
+                self.db.log.append(True, sql, '')
+                return
+            except DBError as e:
+                err = e
+                if attempt<attempts - 1:
+                    time.sleep(0.5*(attempt + 1))
+        self.db.log.append(False, sql, str(err.__cause__))
+        raise err
+
+    def _save_log (self, log_path):
+        """Saves execution log to Excel, printing (not raising) errors."""
+        try:
+            uio.save_df_chunks_to_excel(self.db.log.iter_dfs(), log_path)
+        except Exception as e:
+            print('Encountered exception saving execution '
+                  'log:\n\n{}\n'.format(e))
+
+    def _finalize (self, log_path):
+        """Saves execution log if there were failures and commits changes
+        unless user declines to. Returns True if changes were committed.
+        """
         commit_chgs = True
 
         if self.db.failures==0:
             print('Full success.')
         else:
             print('{} failed. Saving execution log.'.format(self.db.failures))
-            try:
-                uio.save_df_to_excel(self.db.log, log_path)
-            except Exception as e:
-                print('Encountered exception saving execution '
-                      'log:\n\n{}\n'.format(e))
+            self._save_log(log_path)
             if uio.response_no('Would you like to still commit changes?'):
                 commit_chgs = False
 
         if commit_chgs:
             print('Committing updates...')
             self.db.commit_changes()
+        return commit_chgs
+
+
+def _queries_digest (queries):
+    """Returns digest identifying a list of queries (for checkpoints)."""
+    md5 = hashlib.md5()
+    for sql in queries:
+        md5.update(sql.encode('utf-8'))
+        md5.update(b'\0')
+    return md5.hexdigest()
+
+
+def _load_checkpoint (path, digest):
+    """Returns number of queries already committed according to checkpoint
+    at path (0 if there is none or it belongs to other queries).
+    """
+    if path is None or not os.path.isfile(path):
+        return 0
+    with open(path, 'r') as f:
+        data = json.load(f)
+    if data.get('digest')!=digest:
+        return 0
+    return data['committed']
+
+
+def _save_checkpoint (path, digest, committed):
+    if path is None:
+        return
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'digest':digest, 'committed':committed}, f)
+    os.replace(tmp_path, path)
+
+
+def _remove_checkpoint (path):
+    if path is not None and os.path.isfile(path):
+        os.remove(path)
 
 
 #####################################################################
@@ -234,6 +926,78 @@ class FieldValue(object):
             return value
 
 
+_rgx_tables = re.compile(
+      r'\b(?:join|into|update|table)\s+\[?([A-Za-z_][\w]*)\]?',
+      re.IGNORECASE)
+_rgx_from = re.compile(r'\bfrom\b', re.IGNORECASE)
+# Tokens that split or end a FROM list (at the top parenthesis level): a
+# clause keyword, a join, the end of a subquery or of the statement.
+_rgx_from_token = re.compile(
+      r'\(|\)|,|;|\||\b(?:where|group|order|having|union|inner|left|right|'
+      r'full|cross|join|on)\b',
+      re.IGNORECASE)
+_rgx_from_item = re.compile(r'[(\s]*(?:(select)\b|\[?([A-Za-z_]\w*)\]?)',
+                            re.IGNORECASE)
+
+
+def referenced_tables (sql, strict=False):
+    """Returns set of (lower-cased) table names referenced in sql.
+
+    Every table of a comma-separated FROM list is included, as are tables
+    read by subqueries.
+
+    Args:
+        sql (str): Query.
+        strict (bool): Optional, default False. If True, None is returned
+        when a FROM list can't be fully parsed (so callers can treat the
+        query as touching unknown tables).
+    """
+    tables = {t.lower() for t in _rgx_tables.findall(sql)}
+    for m in _rgx_from.finditer(sql):
+        for item in _from_list_items(sql, m.end()):
+            item_match = _rgx_from_item.match(item)
+            if item_match is None:
+                if strict:
+                    return None
+                continue
+            # Subqueries are covered by their own FROM.
+            if item_match.group(2) is not None:
+                tables.add(item_match.group(2).lower())
+    return tables
+
+
+def _from_list_items (sql, start):
+    """Returns items of the FROM list beginning at sql[start], split on the
+    commas outside of parentheses.
+    """
+    items = []
+    depth = 0
+    item_start = start
+    end = len(sql)
+    for m in _rgx_from_token.finditer(sql, start):
+        token = m.group(0)
+        if token=='(':
+            depth += 1
+        elif token==')' and depth>0:
+            depth -= 1
+        elif depth>0:
+            continue
+        elif token==',':
+            items.append(sql[item_start:m.start()])
+            item_start = m.end()
+        else:
+            end = m.start()
+            break
+    items.append(sql[item_start:end])
+    return items
+
+
+def is_read_query (sql):
+    """Returns True if sql is a SELECT statement that doesn't write data."""
+    sql = sql.lstrip().lower()
+    return sql.startswith('select') and not re.search(r'\binto\b', sql)
+
+
 def field_name_restricted (fld):
     """Returns True if field name is one restricted by Microsoft Access."""
     if fld.lower() in ['date', 'name']:
@@ -271,6 +1035,114 @@ def create_insert_query (field_values, table):
     return sql
 
 
+def create_insert_queries (df, table, schema):
+    """Creates SQL INSERT queries for every row in df.
+
+    Notes:
+        Values are formatted column by column with vectorized string
+        operations (rather than creating a FieldValue per cell), following
+        the same rules as FieldValue.value. All DT.STR values are escaped
+        with clean_str_for_sql() so they should NOT be escaped beforehand.
+
+    Args:
+        df (DataFrame): Data to insert.
+        table (str): Name of table in which data is to be inserted.
+        schema (dict): Maps each column to be included in the queries to
+        its DT.
+
+    Returns:
+        list[str]: SQL-ready INSERT statement for each row in df.
+    """
+    if len(df.index)==0:
+        return []
+    fields = []
+    for col in schema:
+        if field_name_restricted(col):
+            col = '[{}]'.format(col)
+        fields.append(col)
+    prefix = 'INSERT INTO {0} ({1}) VALUES ('.format(table, ', '.join(fields))
+    values = None
+    for col, dtype in schema.items():
+        col_sql = _column_sql(df[col], dtype)
+        values = col_sql if values is None else values + ', ' + col_sql
+    return (prefix + values + ')').tolist()
+
+
+def _column_sql (series, dtype):
+    """Returns Series of values in series formatted for a SQL query."""
+    nulls = series.isnull()
+    if dtype==DT.STR:
+        values = series.astype(str).str.replace("'", "''", regex=False)
+        values = "'" + values + "'"
+    elif dtype==DT.DATE:
+        values = pd.to_datetime(series).dt.strftime('%Y-%m-%d %H:%M:%S')
+        values = '#' + values + '#'
+    elif dtype==DT.BOOL:
+        values = series.astype(bool).astype(str)
+    elif dtype in [DT.NUMBER, None]:
+        values = series.astype(str)
+    else:
+        raise DBError('_column_sql', 'Unhandled DType.')
+    return values.mask(nulls, 'NULL')
+
+
+def create_insert_param_query (columns, table):
+    """Creates parameterized SQL INSERT query (with ? placeholders).
+
+    Args:
+        columns (list[str]): Fields to be included in the INSERT query.
+        table (str): Name of table in which data is to be inserted.
+
+    Returns:
+        str: SQL INSERT statement ready to be used with `executemany`.
+    """
+    fields = []
+    for col in columns:
+        if field_name_restricted(col):
+            col = '[{}]'.format(col)
+        fields.append(col)
+    markers = ', '.join(['?']*len(columns))
+    return 'INSERT INTO {0} ({1}) VALUES ({2})'.format(table,
+                                                       ', '.join(fields),
+                                                       markers)
+
+
+def create_insert_params (df, columns, dtypes=None):
+    """Creates parameter tuples for a parameterized INSERT query.
+
+    Values are converted column by column into native Python types according
+    to their DT so they can be bound by pyodbc; NaN / NaT become None.
+
+    Args:
+        df (DataFrame): Data to convert.
+        columns (list[str]): Columns to include (in order).
+        dtypes (dict): Optional. Maps column to DT.
+
+    Returns:
+        list[tuple]: One tuple of values per row in df.
+    """
+    if dtypes is None:
+        dtypes = {}
+    values = [_column_params(df[col], dtypes.get(col)) for col in columns]
+    return list(zip(*values))
+
+
+def _column_params (series, dtype):
+    """Returns values in series as a list of native Python values."""
+    nulls = series.isnull().tolist()
+    if dtype==DT.DATE:
+        values = pd.to_datetime(series).dt.to_pydatetime().tolist()
+    elif dtype==DT.BOOL:
+        values = series.astype(bool).tolist()
+    elif dtype==DT.STR:
+        values = series.astype(str).tolist()
+    elif dtype in [DT.NUMBER, None]:
+        values = series.tolist()
+    else:
+        raise DBError('_column_params', 'Unhandled DType.')
+    return [None if null else v for v, null in zip(values, nulls)]
+
+
 def clean_str_for_sql (s):
     """Escape single apostrophes with two apostrophes."""
     return s.replace("'", "''")
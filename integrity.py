@@ -5,8 +5,10 @@ Testing the integrity of the data in the database through various checks.
 import dfs
 import dfs.db.qual_ctrl as dqc
 import dfs.utils.data_utils as udu
+import dfs.utils.db as udb
 import dfs.utils.io as uio
 import dfs.utils.main as dfm
+import numpy as np
 from pandas import DataFrame
 import pandas as pd
 
@@ -29,6 +31,8 @@ class DBIntegrityCheck(object):
     Args:
         season (int): Optional, defaults to current season. Specific season to
         perform integrity checks for in pstats & tstats.
+        db (DBWrapper): Optional. Open session used to load the names known
+        to the NameConverter.
     """
 
     # Boundary constraints.
@@ -37,7 +41,7 @@ class DBIntegrityCheck(object):
     MIN_OPEN_PTS = 150
     MAX_LEVENSHTEIN = 4
 
-    def __init__ (self, season=None):
+    def __init__ (self, season=None, db=None):
         """Loads working copies of PStats / TStats and inits error log."""
         self.pstats = dfm.load_pstats(season)
         self.tstats = dfm.load_tstats(season)
@@ -46,7 +50,7 @@ class DBIntegrityCheck(object):
         self.err_log = pd.DataFrame(columns=['table', 'id', 'info'])
         self.name_log = pd.DataFrame(columns=['name1', 'name2', 'dist'])
         self.known_sim_names = dqc.load_known_similar_names()
-        self.name_converter = dqc.NameConverter()
+        self.name_converter = dqc.NameConverter(db=db)
 
     def run (self):
         """Executes all inspection methods."""
@@ -61,19 +65,16 @@ class DBIntegrityCheck(object):
         between those pairs and stores results in name_log attribute.
         """
         uniq_names = self.pstats['player'].unique().tolist()
+        # Distances must be strictly less than MAX_LEVENSHTEIN.
+        pairs = dqc.similar_name_pairs(uniq_names, self.MAX_LEVENSHTEIN - 1)
 
-        for i, ref_name in enumerate(uniq_names[:-1]):
-            other_names = uniq_names[i + 1:]
-            distances = dqc.name_edit_distances(ref_name, other_names)
-            distances = [x for x in distances if x[1]<self.MAX_LEVENSHTEIN]
-
-            for (name, dist) in distances:
-                if self._names_are_equiv(ref_name, name):
-                    continue
-
-                row = {'name1':ref_name, 'name2':name, 'dist':dist}
-                self.name_log = self.name_log.append(row, ignore_index=True)
+        rows = []
+        for (ref_name, name, dist) in pairs:
+            if self._names_are_equiv(ref_name, name):
+                continue
+            rows.append({'name1':ref_name, 'name2':name, 'dist':dist})
 
+        self.name_log = pd.DataFrame(rows, columns=['name1', 'name2', 'dist'])
         self.name_log.sort_values(by='name1', ascending=False, inplace=True)
 
     def inspect_inj_names (self):
@@ -92,14 +93,116 @@ class DBIntegrityCheck(object):
                 self._log(table, info, name)
 
     def inspect_pstats (self):
-        # Conduct checks on GD / TEAM groups
-        for details, grp in self.pstats.groupby(['gd', 'team']):
-            gd, team = details
-            self.__inspect_team_gd_group(grp, gd, team)
+        """Conducts checks on every GD / TEAM group of PStats at once.
+
+        Notes:
+            Logs the same errors, in the same order, as running the checks
+            group by group: only the first failed check is logged for each
+            group.
+        """
+        pstats = self.pstats
+        keys = [pstats['gd'], pstats['team']]
+        grouped = pstats.groupby(['gd', 'team'])
+        grps = pd.DataFrame({
+            'rows':grouped.size(),
+            'starters':(pstats['starter']==True).groupby(keys).sum(),
+            'gid_count':grouped['gid'].nunique(dropna=False),
+            'opp_count':grouped['opp'].nunique(dropna=False),
+            'tsid_count':grouped['tsid'].nunique(dropna=False),
+            'player_count':grouped['player'].nunique(dropna=False)})
+        if len(grps.index)==0:
+            return
+
+        # First row of each group holds its gid / opp / tsid (only relevant
+        # once the group is known to have a single one of each).
+        first = grouped.head(1).set_index(['gd', 'team'])
+        first = first.reindex(grps.index)
+        grps['gid'] = first['gid'].values
+        grps['opp'] = first['opp'].values
+        grps['tsid'] = first['tsid'].values
+        grps = grps.reset_index()
+
+        # gid of the opponent's gd/team group.
+        opp_idx = pd.MultiIndex.from_arrays([grps['gd'], grps['opp']])
+        grps['opp_gid'] = first['gid'].reindex(opp_idx).values
+
+        # TStats records matching tsid.
+        tsid_counts = self.tstats['id'].value_counts()
+        grps['tsid_matches'] = grps['tsid'].map(tsid_counts).fillna(0)
+        trows = self.tstats.drop_duplicates('id').set_index('id')
+        trows = trows.reindex(grps['tsid'])
+        grps['tstats_gd'] = trows['gd'].values
+        grps['tstats_team'] = trows['team'].values
+
+        # Checks in order of precedence.
+        checks = [
+            (grps['rows']<7, 'PStats', 'Row count < 7'),
+            (grps['starters']!=5, 'PStats', 'starter count != 5'),
+            (grps['gid_count']!=1, 'PStats', 'gid count != 1'),
+            (grps['opp_count']!=1, 'PStats', 'opp count != 1'),
+            (grps['gid']!=grps['opp_gid'], 'PStats', 'opp gid != gid'),
+            (grps['tsid_count']!=1, 'PStats', 'tsid count != 1'),
+            (grps['tsid_matches']!=1, 'TStats',
+             'TStats.id = tsid match count != 1'),
+            (grps['gd']!=grps['tstats_gd'], 'TStats', 'TStats.GD != GD'),
+            (grps['team']!=grps['tstats_team'], 'TStats',
+             'TStats.team != team'),
+            (grps['rows']!=grps['player_count'], 'PStats', 'Duplicate name')]
+        conditions = [c[0].values for c in checks]
+        tables = np.select(conditions, [c[1] for c in checks], default='')
+        infos = np.select(conditions, [c[2] for c in checks], default='')
+
+        dids = 'gd/team grp (' + grps['gd'].dt.strftime('%Y%m%d') + '/' + \
+               grps['team'].astype(str) + ')'
+        errs = pd.DataFrame({'table':tables, 'id':dids.values, 'info':infos},
+                            columns=['table', 'id', 'info'])
+        self._log_df(errs[errs['info']!=''])
 
     def inspect_tstats (self):
-        for gid, grp in self.tstats.groupby('gid'):
-            self.__inspect_gid_grp(grp, gid)
+        """Conducts checks on every gid pair of TStats at once.
+
+        Notes:
+            Each gid's first and second rows are placed side by side and
+            every check is evaluated as a column mask. Only the first failed
+            check is logged for each gid.
+        """
+        tstats = self.tstats
+        sizes = tstats.groupby('gid').size()
+        if len(sizes.index)==0:
+            return
+
+        pos = tstats.groupby('gid').cumcount()
+        cols = ['gid', 'gd', 'team', 'opp', 'home', 'ot', 'open_spread',
+                'open_pts']
+        row1 = tstats.loc[pos==0, cols].set_index('gid').reindex(sizes.index)
+        row2 = tstats.loc[pos==1, cols].set_index('gid').reindex(sizes.index)
+        home1 = row1['home'].astype(bool)
+        home2 = row2['home'].astype(bool)
+
+        # Checks in order of precedence.
+        checks = [
+            (sizes!=2, 'Row count != 2'),
+            (row1['gd']!=row2['gd'], 'gd count != 1'),
+            ((row1['team']!=row2['opp']) | (row1['opp']!=row2['team']),
+             'opp/team mismatch'),
+            (home1 & home2, '2 home teams'),
+            (~home1 & ~home2, '2 away teams'),
+            (row1['ot']!=row2['ot'], 'OT periods different'),
+            (row1['open_spread']!=-row2['open_spread'],
+             'open_spread not negative versions of each other'),
+            (row1['open_spread'].abs()>self.MAX_OPEN_SPREAD,
+             'open_spread > MAX_OPEN_SPREAD'),
+            (row1['open_pts']!=row2['open_pts'], 'open_pts different'),
+            ((row1['open_pts']>self.MAX_OPEN_PTS) |
+             (row1['open_pts']<self.MIN_OPEN_PTS),
+             'open_pts outside boundaries')]
+        infos = np.select([c[0].values for c in checks],
+                          [c[1] for c in checks], default='')
+
+        dids = 'gid = ' + sizes.index.astype(str)
+        errs = pd.DataFrame({'table':'TStats', 'id':dids, 'info':infos},
+                            columns=['table', 'id', 'info'])
+        self._log_df(errs[errs['info']!=''])
 
     def _names_are_equiv (self, a, b):
         """Returns True if (a, b) are known as equivalent names."""
@@ -109,129 +212,6 @@ class DBIntegrityCheck(object):
                 return True
         return False
 
-    def __inspect_gid_grp (self, grp, gid):
-        """Performs checks on gid slice from TStats."""
-        # All entries made into error log will have same table and data id so
-        # keep them fixed with lambda expression.
-        log = lambda x:self._log('TStats', x, 'gid = {}'.format(gid))
-
-        # only two records
-        if len(grp.index)!=2:
-            log('Row count != 2')
-            return
-
-        # set variables to each of the two rows to make subsequent analysis more
-        # straightforward
-        row1, row2 = grp.iloc[0], grp.iloc[1]
-
-        # only 1 GD
-        if row1['gd']!=row2['gd']:
-            log('gd count != 1')
-            return
-
-        # team / opponent matches up
-        if row1['team']!=row2['opp'] or row1['opp']!=row2['team']:
-            log('opp/team mismatch')
-            return
-
-        # only one home / away team
-        if row1['home'] and row2['home']:
-            log('2 home teams')
-            return
-
-        if not row1['home'] and not row2['home']:
-            log('2 away teams')
-            return
-
-        # OT periods match
-        if row1['ot']!=row2['ot']:
-            log('OT periods different')
-            return
-
-        # Opening spread figure makes sense on absolute basis and relative
-        # figures are concordant
-        if row1['open_spread']!=-row2['open_spread']:
-            log('open_spread not negative versions of each other')
-            return
-
-        if abs(row1['open_spread'])>self.MAX_OPEN_SPREAD:
-            log('open_spread > MAX_OPEN_SPREAD')
-            return
-
-        # open_pts figures are equivalent and value makes sense
-        if row1['open_pts']!=row2['open_pts']:
-            log('open_pts different')
-            return
-
-        if row1['open_pts']>self.MAX_OPEN_PTS \
-              or row1['open_pts']<self.MIN_OPEN_PTS:
-            log('open_pts outside boundaries')
-            return
-
-    def __inspect_team_gd_group (self, grp, gd, team):
-        """Performs checks on gd/team group from PStats."""
-        # ID to use when logging any inconsistencies found in this method
-        did = 'gd/team grp ({}/{})'.format(gd.strftime('%Y%m%d'), team)
-
-        # 7+ records (players)
-        if len(grp.index)<7:
-            self._log('PStats', 'Row count < 7', did)
-            return
-
-        # 5 starters
-        if len(grp[grp['starter']==True].index)!=5:
-            self._log('PStats', 'starter count != 5', did)
-            return
-
-        # only one GID
-        gids = grp['gid'].unique().tolist()
-        if len(gids)!=1:
-            self._log('PStats', 'gid count != 1', did)
-            return
-
-        # only one OPP
-        opponents = grp['opp'].unique().tolist()
-        if len(opponents)!=1:
-            self._log('PStats', 'opp count != 1', did)
-            return
-
-        # OPP records share the same GID
-        opp_df = self.pstats[(self.pstats['team']==opponents[0]) &
-                             (self.pstats['gd']==gd)]
-        opp_gids = opp_df['gid'].unique().tolist()
-        if gids[0]!=opp_gids[0]:
-            self._log('PStats', 'opp gid != gid', did)
-            return
-
-        # only one TSID
-        tsids = grp['tsid'].unique().tolist()
-        if len(tsids)!=1:
-            self._log('PStats', 'tsid count != 1', did)
-            return
-
-        # TSID matches only one record in TStats
-        trow = self.tstats[self.tstats['id']==tsids[0]]
-        if len(trow.index)!=1:
-            self._log('TStats', 'TStats.id = tsid match count != 1', did)
-            return
-
-        # GD & TEAM match expected in TStats record
-        tstats_gd = trow.iloc[0]['gd']
-        if gd!=tstats_gd:
-            self._log('TStats', 'TStats.GD != GD', did)
-            return
-
-        tstats_team = trow.iloc[0]['team']
-        if tstats_team!=team:
-            self._log('TStats', 'TStats.team != team', did)
-            return
-
-        # no duplicate records for single player
-        uniq_names = grp['player'].unique().tolist()
-        if len(grp.index)!=len(uniq_names):
-            self._log('PStats', 'Duplicate name', did)
-            return
-
     @property
     def errors (self):
         """Returns number of errors logged in DF."""
@@ -246,6 +226,12 @@ class DBIntegrityCheck(object):
         row = {'table':tbl, 'id':data_id, 'info':info}
         self.err_log = self.err_log.append(row, ignore_index=True)
 
+    def _log_df (self, errs):
+        """Adds errors in DF with the same columns as err_log to err_log."""
+        if len(errs.index)==0:
+            return
+        self.err_log = pd.concat([self.err_log, errs], ignore_index=True)
+
 
 def inspect_db (save_path=None):
     """Runs DBIntegrityCheck and displays results, saving discrepancy log to
@@ -258,7 +244,10 @@ def inspect_db (save_path=None):
     if save_path is None:
         save_path = dfs.Folders.DFExperiments + 'Database Integrity Check'
 
-    dbc = DBIntegrityCheck()
+    with udb.DBPool(dfm.create_nba_dbwrapper,
+                    cache=udb.QueryCache()) as pool:
+        with pool.session() as db:
+            dbc = DBIntegrityCheck(db=db)
     dbc.run()
     if dbc.errors==0 and dbc.sim_names==0:
         print('All looks good. No errors or similar player names encountered.')
@@ -2,7 +2,10 @@
 Utils for common I/O operations, including datasets and input/output from
 command prompt.
 """
+from contextlib import contextmanager
 import csv
+import hashlib
+import re
 import sys
 
 import openpyxl
@@ -177,18 +180,124 @@ def save_dfs_to_excel (dfs, path, wks_names=None, cols=None, idx=None,
 
 
 def save_data_to_excel (data, path, wks_name='Main'):
-    """Writes data to Excel file."""
-    # Create a workbook and add worksheet.
-    path = clean_excel_path(path)
-    wkb = xlsxwriter.Workbook(path)
-    wks = wkb.add_worksheet(wks_name)
+    """Writes data to Excel file.
+
+    Args:
+        data (Iterable[Sequence]): Rows of values to write. May be a
+        generator; rows are written as they are consumed.
+        path (str): File path.
+        wks_name (str): Name of sheet which will contain data.
+    """
+    with ExcelStreamWriter(path) as writer:
+        writer.write_rows(data, wks_name)
+
+
+def save_df_chunks_to_excel (chunks, path, wks='Main', idx=True,
+                             force_dir=False):
+    """Saves DataFrame chunks to a single Excel worksheet with flat memory
+    use.
+
+    Args:
+        chunks (Iterable[DataFrame]): Chunks sharing the same columns.
+        path (str): File path to save data to.
+        wks (str): Optional. Name of worksheet data saved to.
+        idx (bool): Default True. Write row names (index).
+        force_dir (bool): Default False. If True, then a folder is made to
+        accommodate the implied folder from the file path.
+    """
+    with ExcelStreamWriter(path, force_dir) as writer:
+        writer.write_df_chunks(chunks, wks, idx)
+
 
-    # Output each list as a row in worksheet.
-    for row, values in enumerate(data):
-        for col, val in enumerate(values):
-            wks.write(row, col, val)
+class ExcelStreamWriter(object):
+    """Streams rows into an xlsx workbook using xlsxwriter's constant_memory
+    mode.
+
+    Notes:
+        In constant_memory mode each row is flushed to disk once a later row
+        is written, so memory use stays flat regardless of the number of
+        cells. Rows must therefore be written in order within each
+        worksheet (different worksheets can be interleaved).
+
+    Examples:
+        with ExcelStreamWriter(path) as writer:
+            writer.write_rows([('a', 'b'), (1, 2)], 'Main')
+            writer.write_df_chunks(chunks, 'Other')
+
+    Attributes:
+        path (str): Cleaned file path being written to.
+        wkb (xlsxwriter.Workbook): Workbook being written.
+        next_rows (dict): Maps worksheet name to the next row to write.
+    """
 
-    wkb.close()
+    def __init__ (self, path, force_dir=False):
+        self.path = clean_excel_path(path)
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            if not force_dir:
+                raise FileNotFoundError("Directory doesn't exist: {}".format(
+                      directory))
+            os.makedirs(directory)
+        self.wkb = xlsxwriter.Workbook(self.path, {
+            'constant_memory':True,
+            'default_date_format':'yyyy-mm-dd hh:mm:ss'})
+        self._sheets = {}
+        self.next_rows = {}
+
+    def _get_wks (self, wks_name):
+        if wks_name not in self._sheets:
+            self._sheets[wks_name] = self.wkb.add_worksheet(wks_name)
+            self.next_rows[wks_name] = 0
+        return self._sheets[wks_name]
+
+    def write_rows (self, rows, wks_name='Main'):
+        """Appends rows (each a sequence of values) to worksheet."""
+        wks = self._get_wks(wks_name)
+        row = self.next_rows[wks_name]
+        for values in rows:
+            wks.write_row(row, 0, [_clean_excel_value(v) for v in values])
+            row += 1
+        self.next_rows[wks_name] = row
+
+    def write_df_chunks (self, chunks, wks_name='Main', idx=True):
+        """Appends DataFrame (or chunks of one) to worksheet, writing the
+        column headers before the first chunk's rows.
+        """
+        if isinstance(chunks, (DataFrame, Series)):
+            chunks = [chunks]
+        for df in chunks:
+            if isinstance(df, Series):
+                df = df.to_frame()
+            if self.next_rows.get(wks_name, 0)==0:
+                header = list(df.columns)
+                if idx:
+                    header = [df.index.name] + header
+                self.write_rows([header], wks_name)
+            self.write_rows(df.itertuples(index=idx, name=None), wks_name)
+
+    def close (self):
+        """Writes workbook to path."""
+        self.wkb.close()
+
+    def __enter__ (self):
+        return self
+
+    def __exit__ (self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _clean_excel_value (value):
+    """Converts missing values (None, NaN, NaT) to None so they are left
+    blank.
+    """
+    if value is None:
+        return None
+    try:
+        if value!=value:
+            return None
+    except (TypeError, ValueError):
+        pass
+    return value
 
 
 def save_data_to_csv (data, path, delimiter=',', lineterminator='\n'):
@@ -221,19 +330,140 @@ def write_list_to_excel (data, path, wks_name='Main'):
         if len(data)==0:
             raise IOUtilsError('write_list_to_excel', 'data is empty.')
 
-    # Create a workbook and add worksheet.
-    path = clean_excel_path(path)
-    wkb = xlsxwriter.Workbook(path)
-    wks = wkb.add_worksheet(wks_name)
-
     # Output each item from list on new row in worksheet.
-    for row, value in enumerate(data):
-        wks.write(row, 0, value)
-
-    wkb.close()
+    save_data_to_excel(([value] for value in data), path, wks_name)
 
 
 #####################################################################
+# Default folder for read_excel_cached(). Kept out of synced folders (e.g.
+# Dropbox) so cache files are neither uploaded nor spread across machines.
+EXCEL_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache',
+                               'excel_cache')
+
+# Date stamps in workbook names (e.g. 'season-player-feed-03-14-2018').
+_rgx_date_stamp = re.compile(r'[-_ ]?\d{1,4}[-_.]\d{1,2}[-_.]\d{1,4}')
+
+
+def read_excel_cached (path, cache_dir=None, date_cols=None, filters=None,
+                       **read_kwargs) -> DataFrame:
+    """Reads Excel worksheet into DataFrame through a Parquet cache.
+
+    Notes:
+        The first read parses the workbook with pd.read_excel() and saves the
+        result as Parquet. Later reads of the same, unchanged file (same
+        path, modification time and size) load the Parquet file instead,
+        applying `filters` while reading so only matching row groups are
+        loaded. Requires pyarrow. Object columns mixing types (e.g. 1 and
+        'B2B') are converted to str (nulls kept) so they can be saved. The
+        first read also returns the data loaded back from Parquet, so the
+        result (dtypes included) doesn't depend on whether the file was
+        already cached. If the data cannot be saved as Parquet, the parsed
+        DataFrame is returned filtered but uncached.
+
+        Workbooks whose names only differ by a date stamp (daily feeds) share
+        one cache slot: caching a new version removes the previous one.
+
+    Args:
+        path (str): Excel file path.
+        cache_dir (str): Optional. Folder for cached files. Defaults to
+        EXCEL_CACHE_DIR.
+        date_cols (list[str]): Optional. Columns converted to datetime before
+        caching (so they can be filtered on).
+        filters (list[tuple]): Optional. (column, op, value) predicates in
+        pyarrow format, e.g. [('DATE', '>', min_gd)]. All must be met.
+        read_kwargs: Passed to pd.read_excel() (e.g. sheet_name).
+
+    Returns:
+        DataFrame: Rows meeting all filters.
+    """
+    path = ensure_excel_path_valid(path)
+    cache_path = _excel_cache_path(path, cache_dir, date_cols, read_kwargs)
+    if os.path.isfile(cache_path):
+        return pd.read_parquet(cache_path, filters=filters)
+
+    df = pd.read_excel(path, **read_kwargs)
+    for col in date_cols or []:
+        df[col] = pd.to_datetime(df[col])
+    _coerce_mixed_cols_to_str(df)
+    try:
+        _remove_stale_excel_caches(cache_path)
+        df.to_parquet(cache_path, index=False)
+    except Exception as e:
+        print('Warning: failed to cache {}: {}'.format(path, e))
+        return _filter_df_with_predicates(df, filters)
+    return pd.read_parquet(cache_path, filters=filters)
+
+
+def _excel_cache_path (path, cache_dir, date_cols, read_kwargs):
+    """Returns cache file path named '{slot}-{path digest}.parquet'.
+
+    Notes:
+        The slot is keyed on the workbook's folder and name without date
+        stamps plus the read arguments, so successive daily feeds map to the
+        same slot. The second digest covers the exact path, mtime and size.
+    """
+    if cache_dir is None:
+        cache_dir = EXCEL_CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    folder, name = os.path.split(os.path.abspath(path))
+    stem = undated_file_stem(path)
+    slot_key = '{}|{}|{}|{}'.format(folder, stem, sorted(date_cols or []),
+                                    sorted(read_kwargs.items()))
+    slot = hashlib.md5(slot_key.encode('utf-8')).hexdigest()[:12]
+    stat = os.stat(path)
+    file_key = '{}|{}|{}'.format(name, stat.st_mtime_ns, stat.st_size)
+    digest = hashlib.md5(file_key.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(cache_dir, '{}-{}-{}.parquet'.format(stem, slot,
+                                                             digest))
+
+
+def undated_file_stem (path):
+    """Returns file name of path without extension and date stamps, e.g.
+    'season-player-feed' for '.../season-player-feed-03-14-2018.xlsx'.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    return _rgx_date_stamp.sub('', name) or 'workbook'
+
+
+def _remove_stale_excel_caches (cache_path):
+    """Deletes other caches in the same slot (previous versions or dates of
+    the workbook).
+    """
+    cache_dir, name = os.path.split(cache_path)
+    prefix = name.rsplit('-', 1)[0] + '-'
+    for f in get_all_dir_files(cache_dir):
+        if f.startswith(prefix) and f!=name:
+            os.remove(os.path.join(cache_dir, f))
+
+
+def _coerce_mixed_cols_to_str (df):
+    """Converts non-null values of object columns mixing types to str
+    (in place) so df can be saved as Parquet. Columns only mixing ints and
+    floats (or holding nulls) are left as they are.
+    """
+    for col in df.columns[df.dtypes==object]:
+        if pd.api.types.infer_dtype(df[col], skipna=True) in (
+              'mixed', 'mixed-integer'):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+
+
+def _filter_df_with_predicates (df, filters):
+    """Applies pyarrow-style (column, op, value) filters to df."""
+    if not filters:
+        return df
+    ops = {'=':'__eq__', '==':'__eq__', '!=':'__ne__', '<':'__lt__',
+           '<=':'__le__', '>':'__gt__', '>=':'__ge__'}
+    mask = pd.Series(True, index=df.index)
+    for col, op, value in filters:
+        if op=='in':
+            mask &= df[col].isin(value)
+        elif op=='not in':
+            mask &= ~df[col].isin(value)
+        else:
+            mask &= getattr(df[col], ops[op])(value)
+    return df[mask].reset_index(drop=True)
+
+
 def read_excel_df_xlwings (path, wks_name, anchor_cell):
     """Reads Excel worksheet data into DataFrame using xlwings.
 
@@ -285,60 +515,175 @@ def read_excel_data_openpyxl (path, wks_name, first_row=1, last_row=None,
     """
     path = ensure_excel_path_valid(path)
     wkb = openpyxl.load_workbook(path, read_only=True, data_only=True)
-    wks = wkb[wks_name]
+    try:
+        wks = wkb[wks_name]
+        if last_col is None:
+            last_col = WksTools.get_last_col(wks, first_row)
+        if last_row is not None:
+            return list(_iter_wks_rows(wks, first_row, last_row, first_col,
+                                       last_col))
+        # Read up to the stored dimensions in the same pass that finds the
+        # last row, then drop trailing rows with an empty first column.
+        data = list(_iter_wks_rows(wks, first_row, wks.max_row, first_col,
+                                   last_col))
+        while data and data[-1][0] is None:
+            data.pop()
+        return data
+    finally:
+        wkb.close()
 
-    if last_row is None:
-        last_row = WksTools.get_last_row(wks, first_col)
-    if last_col is None:
-        last_col = WksTools.get_last_col(wks, first_row)
 
-    data = []
-    for row in range(first_row, last_row + 1):
-        row_data = []
-        for col in range(first_col, last_col + 1):
-            value = wks.cell(row=row, column=col).value
-            row_data.append(value)
-        data.append(row_data)
-    return data
+def iter_excel_rows (path, wks_name, min_row=1, max_row=None, min_col=1,
+                     max_col=None, chunk_size=None):
+    """Lazily reads Excel data row by row using openpyxl's streaming reader.
+
+    Notes:
+        The workbook is opened in read-only mode and the worksheet XML is
+        parsed a single time, so memory use does not grow with the size of
+        the sheet. The workbook is closed once the generator is exhausted
+        (or closed). To make several reads of the same sheet, open it once
+        with open_excel_wks() and use iter_wks_rows() instead.
+
+    Args:
+        path (str): File path.
+        wks_name (str): Name of worksheet containing data. If None, the
+        first worksheet is read.
+        min_row (int): First row to read (1-index based).
+        max_row (int): Optional. Last row to read. If not provided, rows are
+        read until the end of the worksheet.
+        min_col (int): First column to read (1-index based).
+        max_col (int): Optional. Last column to read. If not provided,
+        inferred from the worksheet dimensions.
+        chunk_size (int): Optional. If provided, lists of up to chunk_size
+        rows are yielded instead of individual rows.
+
+    Yields:
+        list: Column values for a row (or list of such rows if chunk_size is
+        provided).
+    """
+    with open_excel_wks(path, wks_name) as wks:
+        yield from iter_wks_rows(wks, min_row, max_row, min_col, max_col,
+                                 chunk_size)
+
+
+@contextmanager
+def open_excel_wks (path, wks_name=None):
+    """Opens workbook in read-only mode and yields worksheet wks_name (the
+    first worksheet if None), closing the workbook on exit.
+
+    Notes:
+        Only the sheet's header is parsed on opening, so its stored
+        dimensions (wks.max_row / wks.max_column, None if not recorded) are
+        cheap to read. Rows are streamed with iter_wks_rows().
+    """
+    path = ensure_excel_path_valid(path)
+    wkb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield wkb.worksheets[0] if wks_name is None else wkb[wks_name]
+    finally:
+        wkb.close()
+
+
+def iter_wks_rows (wks, min_row=1, max_row=None, min_col=1, max_col=None,
+                   chunk_size=None):
+    """Same as iter_excel_rows() for a worksheet that is already open (e.g.
+    with open_excel_wks()).
+    """
+    rows = _iter_wks_rows(wks, min_row, max_row, min_col, max_col)
+    if chunk_size is None:
+        yield from rows
+        return
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk)==chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _iter_wks_rows (wks, min_row, max_row, min_col, max_col):
+    """Yields rows of values from wks with ws.iter_rows(values_only=True).
+
+    Every row has the same number of values when max_col is provided, and
+    rows missing at the end of the worksheet up to max_row are yielded
+    filled with None.
+    """
+    width = None if max_col is None else max_col + 1 - min_col
+    row_num = min_row - 1
+    for values in wks.iter_rows(min_row=min_row, max_row=max_row,
+                                min_col=min_col, max_col=max_col,
+                                values_only=True):
+        row_num += 1
+        row = list(values)
+        if width is not None and len(row)<width:
+            row.extend([None]*(width - len(row)))
+        yield row
+    if max_row is not None and width is not None:
+        for _ in range(row_num, max_row):
+            yield [None]*width
 
 
 class WksTools(object):
     """Static class for utils related to openpyxl Worksheets."""
 
     @staticmethod
-    def get_last_row (wks, col, iter_start=1000):
-        """Returns row of first cell encountered in col column with value
-        that is not None.
+    def get_last_row (wks, col, iter_start=None):
+        """Returns row of last cell in col column with value that is not None.
 
         Args:
             wks (Worksheet): Worksheet we care about.
             col (int): Column to use as proxy for the entire sheet.
-            iter_start (int): Row from which to begin iterating upward.
-
-        Iterates upward beginning at cell coordinates (iter_start, col) to find
-        cell containing value.
+            iter_start (int): Optional. Last row to consider. Defaults to the
+            worksheet's max_row (i.e., its dimension metadata).
+
+        Cells of a regular worksheet are checked from the bound upwards, so
+        the answer is immediate when the column has no trailing blanks. A
+        read-only worksheet is read in a single streaming pass instead
+        (random cell access re-parses the sheet in read-only mode). Returns
+        1 if the column is empty.
         """
-        for row in range(iter_start, 0, -1):
-            if wks.cell(row=row, column=col).value is not None:
-                return row
-        return 1
+        max_row = iter_start if iter_start is not None else wks.max_row
+        if isinstance(wks, Worksheet):
+            for row in range(max_row, 0, -1):
+                if wks.cell(row=row, column=col).value is not None:
+                    return row
+            return 1
+        last_row = 1
+        rows = wks.iter_rows(min_col=col, max_col=col, max_row=max_row,
+                             values_only=True)
+        for row, values in enumerate(rows, 1):
+            if values and values[0] is not None:
+                last_row = row
+        return last_row
 
     @staticmethod
-    def get_last_col (wks, row, iter_start=100):
-        """Returns column of first cell encountered in row with value that is
-        not None.
+    def get_last_col (wks, row, iter_start=None):
+        """Returns column of last cell in row with value that is not None.
 
         Args:
             wks (Worksheet): Worksheet we care about.
             row (int): Row to use as proxy for the entire sheet.
-            iter_start (int): Column from which to begin iterating leftward.
+            iter_start (int): Optional. Last column to consider. Defaults to
+            the worksheet's max_column (i.e., its dimension metadata).
 
-        Iterates leftward beginning at cell coordinates (row, iter_start) to
-        find cell containing value.
+        Cells of a regular worksheet are checked from the bound leftwards;
+        for a read-only worksheet only the requested row is read. Returns 1
+        if the row is empty.
         """
-        for col in range(iter_start, 0, -1):
-            if wks.cell(row=row, column=col)._value is not None:
-                return col
+        max_col = iter_start if iter_start is not None else wks.max_column
+        if isinstance(wks, Worksheet):
+            for col in range(max_col, 0, -1):
+                if wks.cell(row=row, column=col).value is not None:
+                    return col
+            return 1
+        rows = wks.iter_rows(min_row=row, max_row=row, max_col=max_col,
+                             values_only=True)
+        for values in rows:
+            for col in range(len(values), 0, -1):
+                if values[col - 1] is not None:
+                    return col
         return 1
 
 
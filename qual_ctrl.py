@@ -2,7 +2,11 @@
 Methods to perform data integrity checks on DFS data sources and reconcile
 data form different sources.
 """
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import functools
 import operator
+import os
 import re
 from typing import List, Tuple
 
@@ -34,25 +38,38 @@ class NameConverter(object):
         is not a player's name.
         raise_exc (bool): Optional, default True. If True, then `clean()`
         method raises PMissingError when unhandled name encountered.
+        cache_size (int): Optional, default 4096. Max number of distinct
+        names whose resolution is memoized.
+        db (DBWrapper): Optional. Open session used to load names from the
+        database instead of opening new connections.
     """
 
-    def __init__ (self, excl_teams=False, raise_exc=True):
+    def __init__ (self, excl_teams=False, raise_exc=True, cache_size=4096,
+                  db=None):
         """Inits key lists used in determining whether a name is known."""
         self.known_pairs = load_same_name_pairs()
         self.known_missing = load_known_missing()
-        self.known = load_known_names()
+        self.known = load_known_names(db)
         self.unhandled_names = set()
         self.raise_exc = raise_exc
         if excl_teams:
-            teams = load_all_team_representations()
+            teams = load_all_team_representations(db)
             for t in teams:
                 self.known.add(t)
+        self._resolve = functools.lru_cache(maxsize=cache_size)(self._lookup)
 
-    def clean (self, name):
+    def _lookup (self, name):
+        """Returns DB-approved version of name or None if name is unhandled."""
         if name in self.known_pairs:
             return self.known_pairs[name]
         if name in self.known_missing or name in self.known:
             return name
+        return None
+
+    def clean (self, name):
+        result = self._resolve(name)
+        if result is not None:
+            return result
         # Add name to `unhandled_names` and raise error.
         self.unhandled_names.add(name)
         if self.raise_exc:
@@ -60,6 +77,28 @@ class NameConverter(object):
                   'to be missing.'.format(name)
             raise dfm.PMissingError('clean', name, msg)
 
+    def clean_series (self, series):
+        """Cleans every name in series, resolving each distinct name once.
+
+        Notes:
+            Never raises on unhandled names. They are left unchanged in the
+            result and added to `unhandled_names`. Null values are left as is.
+
+        Args:
+            series (Series): Names to clean.
+
+        Returns:
+            Series: Cleaned names (same index as series).
+        """
+        mapping = {}
+        for name in pd.unique(series.dropna()):
+            result = self._resolve(name)
+            if result is None:
+                self.unhandled_names.add(name)
+                result = name
+            mapping[name] = result
+        return series.map(mapping)
+
     def is_problematic (self, name):
         if name in self.known_pairs:
             return True, 'Should be {}.'.format(self.known_pairs[name])
@@ -78,13 +117,25 @@ class NameConverter(object):
         return len(self.unhandled_names)!=0
 
 
-def load_known_names ():
-    """Returns set of names contained in PStats 2017-2018 seasons."""
+def load_known_names (db=None):
+    """Returns set of names contained in PStats 2017-2018 seasons.
+
+    Args:
+        db (DBWrapper): Optional. Open session to query with (e.g. from a
+        DBPool) instead of opening a new connection.
+    """
     sql = 'SELECT player FROM playerstats WHERE season in (2017, 2018)'
-    df = dfm.load_bespoke(sql)
+    df = _load_bespoke(sql, db)
     return set(df['player'].tolist())
 
 
+def _load_bespoke (sql, db=None):
+    """Runs sql on db if provided, otherwise through dfm.load_bespoke()."""
+    if db is not None:
+        return db.query_df(sql)
+    return dfm.load_bespoke(sql)
+
+
 def load_same_name_pairs ():
     """Returns dict mapping various names to their DB-approved version."""
     df = pd.read_excel(dfs.Paths.DataNames, sheet_name='Conversions')
@@ -98,11 +149,15 @@ def load_known_missing ():
     return set(df['player'].unique().tolist())
 
 
-def load_all_team_representations () -> List[str]:
-    """Returns all different references to active teams."""
+def load_all_team_representations (db=None) -> List[str]:
+    """Returns all different references to active teams.
+
+    Args:
+        db (DBWrapper): Optional. Open session to query with.
+    """
     sql = 'SELECT nba_code, short_name, full_name, mascot FROM teams ' \
           'WHERE active=True'
-    df = dfm.load_bespoke(sql)
+    df = _load_bespoke(sql, db)
     results = []
     for field in ['nba_code', 'short_name', 'full_name', 'mascot']:
         results = results + df[field].tolist()
@@ -196,13 +251,110 @@ def create_name_objects (names):
     return s
 
 
+class NameIndex:
+    """Lookup structures over a universe of pre-vetted names, built once so
+    that resolving many names does not rescan the universe.
+
+    Attributes:
+        names (list[str]): Universe of names.
+        by_init_last (dict): Maps (first initial, last name) to the first
+        full name in names with those components.
+        tree (BKTree): Metric tree over names for nearest-neighbour search by
+        Levenshtein distance. Built on first use.
+    """
+
+    def __init__ (self, names):
+        self.names = list(names)
+        self.by_init_last = {}
+        for name in create_name_objects(self.names):
+            key = (name.first[0], name.last)
+            self.by_init_last.setdefault(key, name.full_name)
+        self._tree = None
+
+    @property
+    def tree (self):
+        if self._tree is None:
+            self._tree = BKTree(self.names)
+        return self._tree
+
+    def nearest (self, name):
+        """Returns name from universe with the smallest Levenshtein distance
+        to name (first one in universe order if tied).
+        """
+        return self.tree.nearest(name)[0]
+
+
+class BKTree:
+    """Burkhard-Keller tree over strings using Levenshtein distance.
+
+    Notes:
+        Each node is [item, position, children] where children maps a
+        distance to the child node at that distance from item.
+    """
+
+    def __init__ (self, items):
+        self.root = None
+        for i, item in enumerate(items):
+            self.add(item, i)
+
+    def add (self, item, position):
+        node = [item, position, {}]
+        if self.root is None:
+            self.root = node
+            return
+        cur = self.root
+        while True:
+            dist = levenshtein(item, cur[0])
+            if dist==0 and item==cur[0]:
+                return
+            child = cur[2].get(dist)
+            if child is None:
+                cur[2][dist] = node
+                return
+            cur = child
+
+    def nearest (self, query):
+        """Returns (item, dist) for the item closest to query; ties go to the
+        item added first. Returns (None, None) if tree is empty.
+        """
+        if self.root is None:
+            return None, None
+        best = (float('inf'), float('inf'), None)
+        stack = [self.root]
+        while stack:
+            item, position, children = stack.pop()
+            dist = levenshtein(query, item)
+            if (dist, position)<best[:2]:
+                best = (dist, position, item)
+            for d, child in children.items():
+                if dist - best[0]<=d<=dist + best[0]:
+                    stack.append(child)
+        return best[2], best[0]
+
+    def search (self, query, max_dist):
+        """Returns list of (item, dist) for items within max_dist of query."""
+        s = []
+        if self.root is None:
+            return s
+        stack = [self.root]
+        while stack:
+            item, _, children = stack.pop()
+            dist = levenshtein(query, item)
+            if dist<=max_dist:
+                s.append((item, dist))
+            for d, child in children.items():
+                if dist - max_dist<=d<=dist + max_dist:
+                    stack.append(child)
+        return s
+
+
 class AbbreviatedNameWizard:
     """Finds matches between abbreviated names, such as those used in ESPN's
     box scores and authoritative reference of players' full names.
 
     Attributes:
         raw_names (list[str]): Pre-vetted names (i.e., those in the database).
-        name_objs (list[Name]): Name objects initialized from raw_names.
+        index (NameIndex): Index over raw_names used to resolve names.
         used_levenshtein (dict): Used to log cases where, as a get_final resort,
         we use Levenshtein distance to find the best match among full names
         for the abbreviated name (as opposed to first initial and last name).
@@ -210,7 +362,7 @@ class AbbreviatedNameWizard:
 
     def __init__ (self, universe):
         self.raw_names = universe
-        self.name_objs = create_name_objects(universe)
+        self.index = NameIndex(universe)
         self.used_levenshtein = {}
 
     @staticmethod
@@ -230,16 +382,12 @@ class AbbreviatedNameWizard:
         Args:
             abbrev (str): Abbreviated name.
         """
-        first_init, last_name = self.__get_first_init_last_name(abbrev)
-        for name in self.name_objs:
-            if name.last!=last_name:
-                continue
-            if name.first[0]==first_init:
-                return name.full_name
+        key = self.__get_first_init_last_name(abbrev)
+        if key in self.index.by_init_last:
+            return self.index.by_init_last[key]
 
         # Use edit distance as last resort and log it.
-        edit_distances = name_edit_distances(abbrev, self.raw_names)
-        result = edit_distances[0][0]
+        result = self.index.nearest(abbrev)
         self.used_levenshtein[abbrev] = result
         return result
 
@@ -262,7 +410,8 @@ class MostSimilarNameWizard:
     __rgx_abbr_no_periods = re.compile(r'[A-Z][A-Z]')
 
     def __init__ (self, names: List[str]):
-        self.universe = names
+        # Only used for membership tests.
+        self.universe = set(names)
         self.alias_wizard = AliasWizard()
 
     def __break_down_name_components (self, full_name):
@@ -350,3 +499,160 @@ def name_edit_distances (ref_name, other_names):
         s.append((name, edit_distance(name, ref_name)))
     s.sort(key=operator.itemgetter(1))
     return s
+
+
+def similar_name_pairs (names, max_dist, processes=None):
+    """Finds all pairs of names whose Levenshtein distance (LD) is at most
+    max_dist.
+
+    Notes:
+        Same results as calling name_edit_distances(names[i], names[i+1:])
+        for every i and keeping distances <= max_dist, but candidate pairs
+        are first pruned with a length bound and segment (pigeonhole)
+        blocking and the remaining distances are computed with early
+        termination across a process pool.
+
+    Args:
+        names (list[str]): Unique names to compare.
+        max_dist (int): Largest LD for a pair to be returned.
+        processes (int): Optional. Worker processes used to compute distances.
+        Defaults to os.cpu_count(); 1 computes everything in this process.
+
+    Returns:
+        list[tuple]: (name1, name2, dist) where name1 precedes name2 in
+        names, ordered by name1's position, then dist, then name2's position.
+    """
+    pairs = sorted(_candidate_name_pairs(names, max_dist))
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if processes<=1 or len(pairs)<_MIN_PAIRS_PER_PROCESS*2:
+        matches = _match_name_pairs(names, pairs, max_dist)
+    else:
+        size = max(_MIN_PAIRS_PER_PROCESS, len(pairs)//(processes*4) + 1)
+        chunks = [pairs[i:i + size] for i in range(0, len(pairs), size)]
+        matches = []
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [executor.submit(_match_name_pairs, names, c, max_dist)
+                       for c in chunks]
+            for f in futures:
+                matches.extend(f.result())
+    matches.sort(key=lambda x:(x[0], x[2], x[1]))
+    return [(names[i], names[j], dist) for (i, j, dist) in matches]
+
+
+# Fewest candidate pairs worth sending to a worker process.
+_MIN_PAIRS_PER_PROCESS = 5000
+
+
+def _candidate_name_pairs (names, max_dist):
+    """Returns set of (i, j) positions, i < j, of names that could be within
+    max_dist of each other.
+
+    If LD(a, b) <= max_dist, then splitting a into (max_dist + 1) segments
+    leaves at least one segment that appears unchanged in b, shifted by no
+    more than max_dist positions. Names are indexed by those segments and
+    every name probes the index for names of a compatible length.
+    """
+    n_segs = max_dist + 1
+    by_length = defaultdict(list)
+    for i, name in enumerate(names):
+        by_length[len(name)].append(i)
+
+    # (length, segment #, segment text) -> positions of names.
+    seg_index = defaultdict(list)
+    seg_bounds = {}
+    short = set()
+    for length, idxs in by_length.items():
+        if length<n_segs:
+            # Too short to split; compared directly with everything nearby.
+            short.update(idxs)
+            continue
+        bounds = _segment_bounds(length, n_segs)
+        seg_bounds[length] = bounds
+        for i in idxs:
+            for k, (start, stop) in enumerate(bounds):
+                seg_index[(length, k, names[i][start:stop])].append(i)
+
+    pairs = set()
+    for j, name in enumerate(names):
+        n = len(name)
+        for length in range(max(n - max_dist, 0), n + max_dist + 1):
+            if length not in by_length:
+                continue
+            if length<n_segs or j in short:
+                for i in by_length[length]:
+                    if i!=j:
+                        pairs.add((min(i, j), max(i, j)))
+                continue
+            for k, (start, stop) in enumerate(seg_bounds[length]):
+                seg_len = stop - start
+                first = max(start - max_dist, 0)
+                last = min(start + max_dist, n - seg_len)
+                for pos in range(first, last + 1):
+                    key = (length, k, name[pos:pos + seg_len])
+                    for i in seg_index.get(key, []):
+                        if i!=j:
+                            pairs.add((min(i, j), max(i, j)))
+    return pairs
+
+
+def _segment_bounds (length, n_segs):
+    """Splits range(length) into n_segs near-equal (start, stop) segments."""
+    base, extra = divmod(length, n_segs)
+    bounds, start = [], 0
+    for k in range(n_segs):
+        stop = start + base + (1 if k>=n_segs - extra else 0)
+        bounds.append((start, stop))
+        start = stop
+    return bounds
+
+
+def _match_name_pairs (names, pairs, max_dist):
+    """Returns (i, j, dist) for pairs of name positions within max_dist."""
+    s = []
+    for i, j in pairs:
+        dist = bounded_edit_distance(names[i], names[j], max_dist)
+        if dist<=max_dist:
+            s.append((i, j, dist))
+    return s
+
+
+def levenshtein (a, b):
+    """Returns Levenshtein distance between a and b (same as nltk's
+    edit_distance with default arguments).
+    """
+    return bounded_edit_distance(a, b, max(len(a), len(b)))
+
+
+def bounded_edit_distance (a, b, max_dist):
+    """Returns Levenshtein distance between a and b, or (max_dist + 1) as
+    soon as it is known to exceed max_dist.
+
+    Only cells within max_dist of the diagonal are computed since any
+    alignment leaving that band costs more than max_dist.
+    """
+    len_b = len(b)
+    if abs(len(a) - len_b)>max_dist:
+        return max_dist + 1
+    over = max_dist + 1
+    prev = [j if j<=max_dist else over for j in range(len_b + 1)]
+    for i, char_a in enumerate(a, 1):
+        lo = max(1, i - max_dist)
+        hi = min(len_b, i + max_dist)
+        cur = [over]*(len_b + 1)
+        if i<=max_dist:
+            cur[0] = i
+        row_min = cur[0]
+        for j in range(lo, hi + 1):
+            v = prev[j - 1] + (char_a!=b[j - 1])
+            if prev[j] + 1<v:
+                v = prev[j] + 1
+            if cur[j - 1] + 1<v:
+                v = cur[j - 1] + 1
+            cur[j] = v
+            if v<row_min:
+                row_min = v
+        if row_min>max_dist:
+            return over
+        prev = cur
+    return min(prev[len_b], over)
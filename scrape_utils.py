@@ -6,14 +6,37 @@ Attributes:
     month to an integer.
     html_replacements (dict): Maps HTML characters/strings to the desired
     Python string replacement.
+    default_parser (str): BeautifulSoup parser used when none is specified.
+    'html.parser' unless changed by the caller; set it to FAST_PARSER to
+    opt every get_soup_* call into lxml (note lxml can build a different
+    tree than html.parser for malformed markup).
+    FAST_PARSER (str): 'lxml' if it is installed, otherwise 'html.parser'.
 """
+import asyncio
+import atexit
+from collections import OrderedDict
 import codecs
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import hashlib
+from html.parser import HTMLParser
+import importlib.util
+import io
+import json
+import os.path
 import re
+import tempfile
+import threading
 import time
+from urllib.parse import urlsplit
+import weakref
 
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from pandas import DataFrame, Series
 import requests
 from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
 
 #####################################################################
 __HEADERS = {
@@ -35,49 +58,799 @@ month_conversion = {'jan':1, 'feb':2, 'mar':3, 'apr':4, 'may':5, 'jun':6,
 
 html_replacements = {'&nbsp;':' '}
 
+if importlib.util.find_spec('lxml') is not None:
+    FAST_PARSER = 'lxml'
+else:
+    FAST_PARSER = 'html.parser'
+default_parser = 'html.parser'
+
 
 #####################################################################
-def get_session () -> requests.Session:
-    """Inits Session with frequently used headers."""
+def get_session (pool_size=None, cache=None) -> requests.Session:
+    """Inits Session with frequently used headers.
+
+    Args:
+        pool_size (int): Optional. Max number of keep-alive connections kept
+        per host (requests defaults to 10).
+        cache (ResponseCache): Optional. If provided, GET responses are
+        served from / saved to this cache.
+    """
     sess = requests.Session()
     sess.headers = __HEADERS
+    if pool_size is not None or cache is not None:
+        pool_size = pool_size or requests.adapters.DEFAULT_POOLSIZE
+        if cache is None:
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=pool_size, pool_maxsize=pool_size)
+        else:
+            adapter = CachingAdapter(cache, pool_connections=pool_size,
+                                     pool_maxsize=pool_size)
+        sess.mount('http://', adapter)
+        sess.mount('https://', adapter)
     return sess
 
 
-def get_selenium_driver (driver_type=None):
+def get_selenium_driver (driver_type=None, headless=False):
     if driver_type == 'phantom':
         return webdriver.PhantomJS()
     elif driver_type == 'chrome' or driver_type is None:
-        return webdriver.Chrome()
+        if not headless:
+            return webdriver.Chrome()
+        options = webdriver.ChromeOptions()
+        options.add_argument('--headless=new')
+        return webdriver.Chrome(options=options)
     else:
         raise ValueError('Unhandled driver_type: {}'.format(driver_type))
 
 
-def get_http_response (url) -> requests.Response:
-    return requests.get(url, headers=__HEADERS)
+def get_http_response (url, cache=None) -> requests.Response:
+    if cache is None:
+        return requests.get(url, headers=__HEADERS)
+    with get_session(cache=cache) as sess:
+        return sess.get(url)
+
+
+def make_soup (markup, parser=None, only=None) -> BeautifulSoup:
+    """Inits BeautifulSoup out of markup.
+
+    Args:
+        markup (str|bytes|file): HTML to parse.
+        parser (str): Optional. BeautifulSoup parser ('lxml', 'html.parser',
+        'html5lib'...) or FAST_PARSER. Defaults to default_parser.
+        only (SoupStrainer|str|tuple): Optional. Restricts parsing to matching
+        tags (and their contents) so the rest of the document is skipped.
+        Either a SoupStrainer or the (name, attrs) arguments used to create
+        one, e.g. ('table', {'id':'box-score-basic'}). With html.parser,
+        a 'class' value only matches the tag's full class attribute, so
+        prefer 'id' (or lxml) for tags with several classes.
+    """
+    if only is not None and not isinstance(only, SoupStrainer):
+        only = SoupStrainer(only) if isinstance(only, str) else \
+            SoupStrainer(*only)
+    return BeautifulSoup(markup, parser or default_parser, parse_only=only)
 
 
-def get_soup_from_path (path, parser='html.parser') -> BeautifulSoup:
-    """Inits BeautifulSoup tag from HTML file located at path."""
-    f = codecs.open(path, 'r', encoding='utf-8')
-    return BeautifulSoup(f, parser)
+def get_soup_from_path (path, parser=None, only=None) -> BeautifulSoup:
+    """Inits BeautifulSoup tag from HTML file located at path (which may be a
+    gzip-compressed file such as the bodies saved by ResponseCache). See
+    make_soup() for parser and only.
+    """
+    if path.endswith('.gz'):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return make_soup(f, parser, only)
+    with codecs.open(path, 'r', encoding='utf-8') as f:
+        return make_soup(f, parser, only)
 
 
-def get_soup_from_url (url, parser='html.parser', sleep=0) -> BeautifulSoup:
-    """Inits BeautifulSoup out of HTML scraped from url."""
-    http_req = get_http_response(url)
+def get_soup_from_url (url, parser=None, sleep=0, cache=None,
+                       only=None) -> BeautifulSoup:
+    """Inits BeautifulSoup out of HTML scraped from url (or from cache if
+    provided and it holds a fresh copy of the page). See make_soup() for
+    parser and only.
+    """
+    http_req = get_http_response(url, cache)
     if sleep>0:
         time.sleep(sleep)
-    return BeautifulSoup(http_req.text, parser)
+    return make_soup(http_req.text, parser, only)
 
 
-def get_selenium_soup (url, parser='html.parser', sleep=0) -> BeautifulSoup:
-    """Inits BeautifulSoup out of HTML scraped from url using Selenium."""
+def get_selenium_soup (url, parser=None, sleep=0, only=None,
+                       pool=None) -> BeautifulSoup:
+    """Inits BeautifulSoup out of HTML scraped from url using Selenium. See
+    make_soup() for parser and only.
+
+    Notes:
+        Without a pool, a browser is started for this page alone and quit
+        afterwards; pass a DriverPool when loading several pages.
+    """
+    if pool is not None:
+        return pool.get_soup(url, parser, sleep, only)
     driver = get_selenium_driver()
+    try:
+        return _load_soup(driver, url, parser, sleep, only)
+    finally:
+        driver.quit()
+
+
+def _load_soup (driver, url, parser, sleep, only):
     driver.get(url)
     if sleep > 0:
         time.sleep(sleep)
-    return BeautifulSoup(driver.page_source, parser)
+    return make_soup(driver.page_source, parser, only)
+
+
+class DriverPool(object):
+    """Hands out Selenium drivers from a bounded set of long-lived browsers.
+
+    Notes:
+        Drivers are checked on checkout (and replaced if the browser died),
+        quit if the with block raises a WebDriverException, and recycled
+        once they have been checked out max_pages times. All drivers are
+        quit when the pool is closed.
+
+    Examples:
+        with DriverPool(max_size=4) as pool:
+            soups = pool.map_urls(urls, sleep=1)
+
+    Attributes:
+        factory (callable): Returns a new driver. Defaults to a headless
+        Chrome from get_selenium_driver().
+        max_size (int): Max number of drivers open at once. Checkouts beyond
+        that block until a driver is checked in.
+        max_pages (int): Checkouts after which a driver is replaced (None to
+        never recycle). Each get_soup()/map_urls() page is one checkout.
+    """
+
+    def __init__ (self, factory=None, max_size=2, max_pages=200):
+        self.factory = factory or (
+            lambda: get_selenium_driver(headless=True))
+        self.max_size = max_size
+        self.max_pages = max_pages
+        # [(driver, pages loaded)]
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._closed = False
+
+    @contextmanager
+    def driver (self):
+        """Checks out a driver for the duration of the with block."""
+        if self._closed:
+            raise RuntimeError('DriverPool is closed.')
+        self._slots.acquire()
+        driver = None
+        try:
+            driver, pages = self._checkout()
+            yield driver
+        except WebDriverException:
+            if driver is not None:
+                _quit_driver(driver)
+                driver = None
+            raise
+        finally:
+            if driver is not None:
+                self._checkin(driver, pages + 1)
+            self._slots.release()
+
+    def get_soup (self, url, parser=None, sleep=0,
+                  only=None) -> BeautifulSoup:
+        """Loads url with a pooled driver. See get_selenium_soup()."""
+        with self.driver() as driver:
+            return _load_soup(driver, url, parser, sleep, only)
+
+    def map_urls (self, urls, func=None, parser=None, sleep=0,
+                  only=None) -> list:
+        """Loads urls concurrently (one thread per driver) and returns
+        results in the order of urls.
+
+        Args:
+            urls (list[str]): Urls to load.
+            func (callable): Optional. Called with the driver once the page
+            is loaded; its return value is the result for that url. If
+            None, the result is the page's BeautifulSoup (see make_soup()
+            for parser and only).
+            sleep (float): Optional. Seconds to wait after loading each page.
+
+        Returns:
+            list: Result for each url.
+        """
+        def load (url):
+            if func is None:
+                return self.get_soup(url, parser, sleep, only)
+            with self.driver() as driver:
+                driver.get(url)
+                if sleep > 0:
+                    time.sleep(sleep)
+                return func(driver)
+
+        with ThreadPoolExecutor(max_workers=self.max_size) as executor:
+            return list(executor.map(load, urls))
+
+    def _checkout (self):
+        """Returns (driver, pages) for a live idle driver or a new one."""
+        while True:
+            with self._lock:
+                item = self._idle.pop() if self._idle else None
+            if item is None:
+                return self.factory(), 0
+            if _is_alive(item[0]):
+                return item
+            _quit_driver(item[0])
+
+    def _checkin (self, driver, pages):
+        """Returns driver to pool, or quits it if it reached max_pages or
+        the pool is closed.
+        """
+        with self._lock:
+            if not self._closed and (self.max_pages is None or
+                                     pages<self.max_pages):
+                self._idle.append((driver, pages))
+                return
+        _quit_driver(driver)
+
+    def close (self):
+        """Quits all idle drivers. Drivers still checked out are quit when
+        they are checked in.
+        """
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for driver, _ in idle:
+            _quit_driver(driver)
+
+    def __enter__ (self):
+        return self
+
+    def __exit__ (self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _is_alive (driver):
+    try:
+        driver.current_url
+        return True
+    except Exception:
+        return False
+
+
+def _quit_driver (driver):
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+def read_html_table (markup, attrs=None, index=0) -> DataFrame:
+    """Extracts a table straight into a DataFrame without building a
+    BeautifulSoup tree.
+
+    Notes:
+        Header is the last row inside <thead> (e.g. skipping "over header"
+        rows), or the first row if the table has no <thead>. Body rows that
+        repeat the header are dropped. Cells spanning several columns are
+        repeated in each. Cell text is cleaned with clean_html().
+
+    Args:
+        markup (str): HTML containing the table.
+        attrs (dict): Optional. Attributes the table must have, e.g.
+        {'id':'box-score-basic'}. 'class' matches if it is one of the
+        table's classes.
+        index (int): Optional, default 0. Which of the matching tables to
+        extract.
+
+    Returns:
+        DataFrame: Cell text, one column per header cell. None if there is no
+        matching table.
+    """
+    parser = _TableParser(attrs or {}, index)
+    parser.feed(markup)
+    parser.close()
+    if parser.rows is None:
+        return None
+    rows = [r for r, _ in parser.rows]
+    head = [r for r, in_head in parser.rows if in_head]
+    if head:
+        header = head[-1]
+        rows = rows[len(head):]
+    elif rows:
+        header = rows.pop(0)
+    else:
+        return DataFrame()
+    rows = [r for r in rows if r!=header]
+    width = len(header)
+    rows = [r[:width] + [None]*(width - len(r)) for r in rows]
+    return DataFrame(rows, columns=header)
+
+
+class _TableParser(HTMLParser):
+    """Collects rows of the index-th table matching attrs (see
+    read_html_table()). Tables nested inside it are flattened into the cell
+    they belong to.
+    """
+
+    def __init__ (self, attrs, index):
+        super().__init__(convert_charrefs=True)
+        self.attrs = attrs
+        self.index = index
+        self.matches = 0
+        # [(cells, in_thead)] once matching table is found.
+        self.rows = None
+        self.depth = 0
+        self.done = False
+        self.in_head = False
+        self.row = None
+        self.cell = None
+        self.span = 1
+
+    def _is_match (self, attrs):
+        attrs = dict(attrs)
+        for k, v in self.attrs.items():
+            if k=='class':
+                if v not in (attrs.get('class') or '').split():
+                    return False
+            elif attrs.get(k)!=v:
+                return False
+        return True
+
+    def handle_starttag (self, tag, attrs):
+        if self.done:
+            return
+        if tag=='table':
+            if self.depth>0:
+                self.depth += 1
+            elif self._is_match(attrs):
+                if self.matches==self.index:
+                    self.depth = 1
+                    self.rows = []
+                self.matches += 1
+            return
+        if self.depth!=1:
+            return
+        if tag=='thead':
+            self.in_head = True
+        elif tag=='tr':
+            self._end_row()
+            self.row = []
+        elif tag in ('td', 'th'):
+            self._end_cell()
+            if self.row is None:
+                self.row = []
+            self.cell = []
+            span = dict(attrs).get('colspan') or '1'
+            self.span = int(span) if span.isdigit() else 1
+        elif tag=='br' and self.cell is not None:
+            self.cell.append(' ')
+
+    def handle_endtag (self, tag):
+        if self.depth==0 or self.done:
+            return
+        if tag=='table':
+            self.depth -= 1
+            if self.depth==0:
+                self._end_row()
+                self.done = True
+        elif self.depth!=1:
+            return
+        elif tag=='thead':
+            self._end_row()
+            self.in_head = False
+        elif tag in ('td', 'th'):
+            self._end_cell()
+        elif tag=='tr':
+            self._end_row()
+
+    def handle_data (self, data):
+        if self.cell is not None:
+            self.cell.append(data)
+
+    def _end_cell (self):
+        if self.cell is not None:
+            # Entities are already converted, so &nbsp; arrives as \xa0.
+            text = clean_html(''.join(self.cell).replace('\xa0', ' '))
+            self.row.extend([text]*self.span)
+            self.cell = None
+
+    def _end_row (self):
+        self._end_cell()
+        if self.row:
+            self.rows.append((self.row, self.in_head))
+        self.row = None
+
+
+#####################################################################
+# Response caching.
+
+# Caches whose index is flushed at interpreter exit (held weakly so they can
+# still be garbage collected).
+_open_caches = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_open_caches ():
+    for cache in list(_open_caches):
+        cache.flush()
+
+
+class ResponseCache(object):
+    """Persistent cache of successful GET responses, keyed by url.
+
+    Notes:
+        Bodies are saved gzip-compressed in cache_dir alongside an
+        index.json holding each url's validators (ETag/Last-Modified) and
+        the time it was last fetched. A response younger than its TTL is
+        served without touching the network; an older one is revalidated
+        with a conditional request and only downloaded again if the server
+        reports it changed. Least recently used responses are evicted once
+        the compressed bodies exceed max_bytes.
+
+        The index is rewritten at most every flush_every changes or
+        flush_seconds seconds (and on flush()/close() or interpreter exit),
+        so a crash only loses the most recent index updates. Lookups count
+        as changes too, so the LRU order is kept across runs.
+
+    Attributes:
+        cache_dir (str): Folder holding the cache.
+        ttl (float): Seconds a response is served without revalidation.
+        ttl_rules (list[tuple]): Optional. (regex, seconds) pairs checked in
+        order against the url before falling back to ttl, e.g.
+        [('/boxscores/', float('inf'))] to never revalidate final box scores.
+        max_bytes (int): Max total size of compressed bodies.
+        nbytes (int): Current total size of compressed bodies.
+        flush_every (int): Changes after which the index is saved.
+        flush_seconds (float): Seconds after which pending index changes
+        are saved.
+    """
+
+    def __init__ (self, cache_dir, ttl=24*3600, ttl_rules=None,
+                  max_bytes=512*1024**2, flush_every=100, flush_seconds=30):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.ttl_rules = [(re.compile(rgx), secs)
+                          for rgx, secs in (ttl_rules or [])]
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        # url -> {'etag', 'last_modified', 'fetched', 'size', 'headers'}
+        self._index = OrderedDict()
+        os.makedirs(cache_dir, exist_ok=True)
+        if os.path.isfile(self._index_path):
+            with open(self._index_path, 'r') as f:
+                self._index = OrderedDict(json.load(f))
+        self.nbytes = sum(e['size'] for e in self._index.values())
+        _open_caches.add(self)
+
+    def ttl_for (self, url):
+        """Returns seconds a response for url stays fresh."""
+        for rgx, secs in self.ttl_rules:
+            if rgx.search(url):
+                return secs
+        return self.ttl
+
+    def lookup (self, url):
+        """Returns (entry, is_fresh) for url, or (None, False)."""
+        with self._lock:
+            entry = self._index.get(url)
+            if entry is None:
+                return None, False
+            moved = next(reversed(self._index))!=url
+            self._index.move_to_end(url)
+        if moved:
+            self._index_changed()
+        age = time.time() - entry['fetched']
+        return entry, age<self.ttl_for(url)
+
+    def path (self, url):
+        """Returns path of the compressed body cached for url, or None.
+        The file can be read directly with get_soup_from_path().
+        """
+        with self._lock:
+            if url not in self._index:
+                return None
+        return self._body_path(url)
+
+    def read (self, url):
+        """Returns body cached for url (bytes), or None."""
+        path = self.path(url)
+        if path is None:
+            return None
+        try:
+            with gzip.open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            self.remove(url)
+            return None
+
+    def store (self, url, resp):
+        """Caches body and validators of resp (a 200 response to url)."""
+        body = gzip.compress(resp.content)
+        self._write_file(self._body_path(url), body)
+        entry = {'etag':resp.headers.get('ETag'),
+                 'last_modified':resp.headers.get('Last-Modified'),
+                 'fetched':time.time(), 'size':len(body),
+                 'headers':{'Content-Type':resp.headers.get('Content-Type',
+                                                            '')}}
+        with self._lock:
+            old = self._index.pop(url, None)
+            if old is not None:
+                self.nbytes -= old['size']
+            self._index[url] = entry
+            self.nbytes += entry['size']
+            evicted = []
+            while self.nbytes>self.max_bytes and len(self._index)>1:
+                old_url, old = self._index.popitem(last=False)
+                self.nbytes -= old['size']
+                evicted.append(old_url)
+        for old_url in evicted:
+            self._remove_body(old_url)
+        self._index_changed()
+
+    def refresh (self, url):
+        """Marks cached response for url as just revalidated."""
+        with self._lock:
+            if url not in self._index:
+                return
+            self._index[url]['fetched'] = time.time()
+        self._index_changed()
+
+    def remove (self, url):
+        with self._lock:
+            entry = self._index.pop(url, None)
+            if entry is None:
+                return
+            self.nbytes -= entry['size']
+        self._remove_body(url)
+        self._index_changed()
+
+    def clear (self):
+        with self._lock:
+            urls = list(self._index)
+            self._index.clear()
+            self.nbytes = 0
+            self._pending += 1
+        for url in urls:
+            self._remove_body(url)
+        self.flush()
+
+    def flush (self):
+        """Saves the index if it has unsaved changes."""
+        with self._write_lock:
+            with self._lock:
+                if self._pending==0:
+                    return
+                data = json.dumps(self._index)
+                self._pending = 0
+                self._last_flush = time.monotonic()
+            self._write_file(self._index_path, data.encode('utf-8'))
+
+    def close (self):
+        self.flush()
+        _open_caches.discard(self)
+
+    def __enter__ (self):
+        return self
+
+    def __exit__ (self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def _index_path (self):
+        return os.path.join(self.cache_dir, 'index.json')
+
+    def _body_path (self, url):
+        digest = hashlib.md5(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, '{}.html.gz'.format(digest))
+
+    def _remove_body (self, url):
+        try:
+            os.remove(self._body_path(url))
+        except OSError:
+            pass
+
+    def _index_changed (self):
+        """Counts an index change and flushes if enough have accumulated."""
+        with self._lock:
+            self._pending += 1
+            due = self._pending>=self.flush_every or \
+                time.monotonic() - self._last_flush>=self.flush_seconds
+        if due:
+            self.flush()
+
+    def _write_file (self, path, data):
+        """Writes data (bytes) to path atomically via a unique temp file."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+
+class CachingAdapter(requests.adapters.HTTPAdapter):
+    """Transport adapter serving GET requests through a ResponseCache.
+    Mounted by get_session(cache=...).
+
+    Notes:
+        Responses served from the cache have `from_cache` set to True.
+    """
+
+    def __init__ (self, cache, **kwargs):
+        self.cache = cache
+        super().__init__(**kwargs)
+
+    def send (self, request, stream=False, **kwargs):
+        if request.method!='GET' or stream:
+            return super().send(request, stream=stream, **kwargs)
+        url = request.url
+        entry, is_fresh = self.cache.lookup(url)
+        if is_fresh:
+            resp = self._cached_response(request, entry)
+            if resp is not None:
+                return resp
+            entry = None
+
+        if entry is not None:
+            if entry['etag']:
+                request.headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                request.headers['If-Modified-Since'] = entry['last_modified']
+        resp = super().send(request, stream=stream, **kwargs)
+        resp.from_cache = False
+        if resp.status_code==304 and entry is not None:
+            # Read and close the 304 so its connection returns to the pool.
+            resp.content
+            resp.close()
+            cached = self._cached_response(request, entry)
+            if cached is not None:
+                self.cache.refresh(url)
+                return cached
+            # Body file is gone, so fetch the page unconditionally.
+            request.headers.pop('If-None-Match', None)
+            request.headers.pop('If-Modified-Since', None)
+            resp = super().send(request, stream=stream, **kwargs)
+            resp.from_cache = False
+        if resp.status_code==200:
+            self.cache.store(url, resp)
+        return resp
+
+    def _cached_response (self, request, entry):
+        body = self.cache.read(request.url)
+        if body is None:
+            return None
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.reason = 'OK'
+        resp.headers = requests.structures.CaseInsensitiveDict(
+            entry['headers'])
+        resp.encoding = requests.utils.get_encoding_from_headers(
+            resp.headers)
+        resp._content = body
+        resp._content_consumed = True
+        resp.raw = io.BytesIO(body)
+        resp.url = request.url
+        resp.request = request
+        resp.connection = self
+        resp.from_cache = True
+        return resp
+
+
+#####################################################################
+# Concurrent fetching.
+
+class TokenBucket(object):
+    """Throttles an asyncio task group to `rate` acquisitions per second,
+    allowing bursts of up to `capacity`.
+    """
+
+    def __init__ (self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire (self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (
+                    now - self.updated)*self.rate)
+                self.updated = now
+                if self.tokens>=1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens)/self.rate)
+
+
+def fetch_many (urls, concurrency=8, per_host_rate=None, retries=2,
+                timeout=30, parser=None, raw=False,
+                cache=None) -> list:
+    """Fetches urls concurrently and returns results in the order of urls.
+
+    Notes:
+        Requests are sent through a single Session (so connections are kept
+        alive and reused) from a pool of `concurrency` threads scheduled by
+        asyncio. Use fetch_many_async() when already inside an event loop.
+
+    Args:
+        urls (list[str]): Urls to fetch.
+        concurrency (int): Optional, default 8. Max requests in flight.
+        per_host_rate (float): Optional. Max requests per second sent to any
+        one host. Unlimited if None.
+        retries (int): Optional, default 2. Number of times a request is
+        retried after a connection error, timeout or 429/5xx status.
+        timeout (float): Optional, default 30. Seconds to wait per request.
+        parser (str): Optional. Parser used when raw is False (see
+        make_soup()).
+        raw (bool): Optional, default False. If True, response bodies are
+        returned as bytes instead of BeautifulSoup objects.
+        cache (ResponseCache): Optional. Cache responses are served from /
+        saved to.
+
+    Returns:
+        list: BeautifulSoup (or bytes) for each url.
+    """
+    return asyncio.run(fetch_many_async(urls, concurrency, per_host_rate,
+                                        retries, timeout, parser, raw, cache))
+
+
+async def fetch_many_async (urls, concurrency=8, per_host_rate=None,
+                            retries=2, timeout=30, parser=None,
+                            raw=False, cache=None) -> list:
+    """Coroutine version of fetch_many()."""
+    loop = asyncio.get_running_loop()
+    sem = asyncio.Semaphore(concurrency)
+    buckets = {}
+    sess = get_session(pool_size=concurrency, cache=cache)
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    async def fetch (url):
+        host = urlsplit(url).netloc
+        if per_host_rate is not None and host not in buckets:
+            buckets[host] = TokenBucket(per_host_rate)
+        async with sem:
+            for attempt in range(retries + 1):
+                if per_host_rate is not None:
+                    await buckets[host].acquire()
+                try:
+                    resp = await loop.run_in_executor(
+                        executor, _get_content, sess, url, timeout)
+                    break
+                except (requests.ConnectionError, requests.Timeout,
+                        _RetryableStatus):
+                    if attempt==retries:
+                        raise
+                    await asyncio.sleep(0.5*2**attempt)
+        return resp if raw else make_soup(resp, parser)
+
+    try:
+        return await asyncio.gather(*(fetch(url) for url in urls))
+    finally:
+        executor.shutdown()
+        sess.close()
+        if cache is not None:
+            cache.flush()
+
+
+class _RetryableStatus(requests.HTTPError):
+    """Raised for response statuses worth retrying (429 and 5xx)."""
+
+
+def _get_content (sess, url, timeout) -> bytes:
+    resp = sess.get(url, timeout=timeout)
+    if resp.status_code==429 or resp.status_code>=500:
+        raise _RetryableStatus('{} for url: {}'.format(resp.status_code, url),
+                               response=resp)
+    resp.raise_for_status()
+    return resp.content
 
 
 #####################################################################
@@ -86,6 +859,11 @@ def clean_html (s, raise_err=True):
     """Cleans text obtained from HTML tags by removing unnecessary space
     or escape characters.
 
+    Notes:
+        Applies html_replacements, collapses runs of spaces/newlines into a
+        single space, drops non-ASCII characters and strips the result. Use
+        clean_html_many() to clean many strings.
+
     Args:
         s (str): String to clean.
         raise_err (bool): Optional, default True. If False, then when an
@@ -95,21 +873,72 @@ def clean_html (s, raise_err=True):
     Returns:
         str: Cleaned text.
     """
+    replacements, rgx = _html_cleaner()
     try:
-        for old, new in html_replacements.items():
+        for old, new in replacements:
             s = s.replace(old, new)
-        # Replace all instances of the newline character (or multiple newline
-        # characters) with a space.
-        s = re.sub('\n+', ' ', s)
-        # Replace all instances of multiple spaces in a row with a single space
-        # so all words have one space between them.
-        s = re.sub(' +', ' ', s)
-        # Encode the content with UTF-8 to eliminate escape characters.
-        s = bytes(s, 'UTF-8')
-        s = s.decode('ascii', 'ignore')
-        return s.strip()
+        return rgx.sub(' ', s).encode('ascii', 'ignore').decode(
+            'ascii').strip()
     except Exception as e:
         if raise_err:
             raise e
         else:
             return s
+
+
+def clean_html_many (strings, raise_err=True):
+    """Applies clean_html() to every string in strings.
+
+    Args:
+        strings (iterable[str]|Series): Strings to clean. A Series is
+        cleaned with vectorized .str methods (non-string values are left
+        as they are).
+        raise_err (bool): Optional, default True. See clean_html().
+
+    Returns:
+        list[str]|Series: Cleaned strings (Series if strings is a Series).
+    """
+    replacements, rgx = _html_cleaner()
+    if isinstance(strings, Series):
+        is_str = strings.map(type)==str
+        if raise_err and not is_str.all():
+            raise TypeError('clean_html_many: Series has non-string values.')
+        cleaned = strings[is_str]
+        for old, new in replacements:
+            cleaned = cleaned.str.replace(old, new, regex=False)
+        cleaned = cleaned.str.replace(rgx, ' ', regex=True)\
+            .str.replace(_rgx_non_ascii, '', regex=True).str.strip()
+        return strings.where(~is_str, cleaned)
+    if replacements or not raise_err:
+        return [clean_html(s, raise_err) for s in strings]
+    sub = rgx.sub
+    return [sub(' ', s).encode('ascii', 'ignore').decode('ascii').strip()
+            for s in strings]
+
+
+_cleaner_cache = {}
+_rgx_non_ascii = re.compile('[^\x00-\x7f]+')
+
+
+def _html_cleaner ():
+    """Returns (replacements, compiled regex) used by clean_html().
+
+    Notes:
+        If every value of html_replacements consists only of spaces or
+        newlines (e.g. &nbsp;), the keys are folded into the whitespace runs
+        the regex collapses into a single space, so replacing and
+        collapsing happen in one re.sub() call and replacements is empty.
+        Otherwise replacements lists html_replacements to apply beforehand,
+        in order. Compiled once per distinct html_replacements.
+    """
+    key = tuple(html_replacements.items())
+    cleaner = _cleaner_cache.get(key)
+    if cleaner is not None:
+        return cleaner
+    if all(new!='' and new.strip(' \n')=='' for _, new in key):
+        alts = ['[ \n]'] + [re.escape(old) for old, _ in key if old]
+        cleaner = ((), re.compile('(?:{})+'.format('|'.join(alts))))
+    else:
+        cleaner = (key, re.compile('[ \n]+'))
+    _cleaner_cache[key] = cleaner
+    return cleaner
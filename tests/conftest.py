@@ -0,0 +1,147 @@
+"""
+Shared pytest fixtures.
+
+Modules are loaded straight from their files (as 'utils_<name>') since the
+repo is imported as the dfs.utils package and its io.py would shadow the
+standard library if the repo folder were put on sys.path. Modules that import
+their siblings through dfs.utils are imported with import_utils() instead.
+"""
+import http.server
+import importlib
+import importlib.util
+import os.path
+import sqlite3
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_module (name):
+    """Imports and returns module name.py from the repo folder."""
+    mod_name = 'utils_' + name
+    if mod_name in sys.modules:
+        return sys.modules[mod_name]
+    spec = importlib.util.spec_from_file_location(
+        mod_name, os.path.join(ROOT, name + '.py'))
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules[mod_name] = mod
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def import_utils (name, requires=()):
+    """Imports and returns dfs.utils.<name>, skipping the test if any module
+    in requires is missing. If the dfs package is not installed, dfs.utils is
+    registered as a package rooted at the repo folder.
+    """
+    for req in requires:
+        pytest.importorskip(req, exc_type=ImportError)
+    try:
+        importlib.import_module('dfs.utils')
+    except ImportError:
+        dfs = sys.modules.setdefault('dfs', types.ModuleType('dfs'))
+        dfs.__path__ = getattr(dfs, '__path__', [])
+        pkg = types.ModuleType('dfs.utils')
+        pkg.__path__ = [ROOT]
+        sys.modules['dfs.utils'] = pkg
+        dfs.utils = pkg
+    return importlib.import_module('dfs.utils.' + name)
+
+
+_IO_REQUIRES = ('openpyxl', 'xlsxwriter', 'xlwings')
+_DB_REQUIRES = ('pyodbc', 'statsmodels') + _IO_REQUIRES
+
+
+@pytest.fixture
+def uio ():
+    return import_utils('io', _IO_REQUIRES)
+
+
+@pytest.fixture
+def udb ():
+    return import_utils('db', _DB_REQUIRES)
+
+
+@pytest.fixture
+def sqlite_db (udb, tmp_path, monkeypatch):
+    """Returns function(cache=None) opening a DBWrapper on a sqlite file
+    (shared by every wrapper made in the test) in place of an ODBC source.
+    """
+    path = str(tmp_path / 'test.db')
+    monkeypatch.setattr(udb.pyodbc, 'connect',
+                        lambda conn_str, autocommit=False: sqlite3.connect(
+                            conn_str))
+    return lambda cache=None: udb.DBWrapper(path, 'test', cache=cache)
+
+
+@pytest.fixture(scope='session')
+def scrape_utils ():
+    pytest.importorskip('bs4')
+    pytest.importorskip('requests')
+    pytest.importorskip('selenium')
+    return load_module('scrape_utils')
+
+
+class _StandInHandler(http.server.BaseHTTPRequestHandler):
+    """Serves '<p>{path}</p>' for any path, with these special prefixes:
+    '/flaky/' answers 503 to the first request, '/busy/' answers 429 to the
+    first request. Every response carries an ETag and conditional requests
+    matching it get a 304.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET (self):
+        server = self.server
+        with server.lock:
+            server.hits.append((self.path, time.monotonic()))
+            server.conns.add(self.client_address)
+            n = sum(1 for p, _ in server.hits if p==self.path)
+        if n==1 and self.path.startswith('/flaky/'):
+            return self._send(503, b'')
+        if n==1 and self.path.startswith('/busy/'):
+            return self._send(429, b'')
+        etag = '"{}"'.format(self.path)
+        if self.headers.get('If-None-Match')==etag:
+            return self._send(304, b'', etag)
+        if server.delay:
+            time.sleep(server.delay)
+        body = '<p>{}</p>'.format(self.path).encode('utf-8')
+        self._send(200, body, etag)
+
+    def _send (self, status, body, etag=None):
+        self.send_response(status)
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message (self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server ():
+    """Local HTTP stand-in server. Yields the server (see _StandInHandler);
+    server.base_url is its root url and server.hits lists (path, time) of
+    every request received.
+    """
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0),
+                                             _StandInHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.hits = []
+    server.conns = set()
+    server.delay = 0
+    server.base_url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
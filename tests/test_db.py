@@ -0,0 +1,274 @@
+"""
+Tests for db.py, run against sqlite in place of an ODBC data source.
+"""
+import os.path
+
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def db (sqlite_db):
+    db = sqlite_db()
+    db.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT)',
+               raise_err=True)
+    db.commit_changes()
+    yield db
+    db.close_resources()
+
+
+def _ids (db):
+    return sorted(db.query_df('SELECT id FROM t', use_cache=False)['id'])
+
+
+def test_bulk_insert_failed_batch_keeps_only_good_rows (db):
+    # Row 6 repeats id 5 so the second batch fails after sending row 5.
+    df = pd.DataFrame({'id': [0, 1, 2, 3, 4, 5, 5, 7, 8, 9],
+                       'name': list('abcdefghij')})
+    rows, _ = db.bulk_insert('t', df, ['id', 'name'], batch_size=4)
+    db.commit_changes()
+    assert rows==9
+    assert _ids(db)==[0, 1, 2, 3, 4, 5, 7, 8, 9]
+    assert db.failures==2  # The batch and its duplicate row.
+
+
+def test_bulk_insert_refuses_rollback_over_pending_changes (udb, db):
+    db.execute("INSERT INTO t VALUES (100, 'x')", raise_err=True)
+    df = pd.DataFrame({'id': [1, 1], 'name': ['a', 'b']})
+    with pytest.raises(udb.DBError):
+        db.bulk_insert('t', df, ['id', 'name'])
+    db.commit_changes()
+    assert 100 in _ids(db)
+
+
+def test_fast_executemany_off_for_access_driver (db):
+    class _Conn(object):
+        def __init__ (self, driver):
+            self.driver = driver
+
+        def getinfo (self, _):
+            return self.driver
+
+    conn = db.conn
+    try:
+        db.conn = _Conn('ACEODBC.DLL')
+        assert not db.supports_fast_executemany()
+        db.conn = _Conn('msodbcsql17.dll')
+        assert db.supports_fast_executemany()
+    finally:
+        db.conn = conn
+
+
+@pytest.fixture
+def cached_db (udb, db):
+    db.cache = udb.QueryCache()
+    db.execute("INSERT INTO t VALUES (1, 'a')", raise_err=True)
+    db.commit_changes()
+    return db
+
+
+def _raw_insert (db, id_):
+    """Inserts row behind the wrapper's back (so its cache is not told)."""
+    db.conn.execute('INSERT INTO t VALUES (?, ?)', (id_, 'raw'))
+    db.conn.commit()
+
+
+def test_query_df_served_from_cache (cached_db):
+    assert _ids(cached_db)==[1]
+    cached_db.query_df('SELECT id FROM t')
+    _raw_insert(cached_db, 2)
+    assert cached_db.query_df('SELECT id FROM t')['id'].tolist()==[1]
+
+
+def test_execute_evicts_table_entries (cached_db):
+    cached_db.query_df('SELECT id FROM t')
+    cached_db.query_df('SELECT 1 AS x')
+    _raw_insert(cached_db, 2)
+    cached_db.execute("INSERT INTO t VALUES (3, 'c')", raise_err=True)
+    assert len(cached_db.cache._entries)==1  # Only 'SELECT 1 AS x' left.
+    cached_db.commit_changes()
+    df = cached_db.query_df('SELECT id FROM t')
+    assert sorted(df['id'])==[1, 2, 3]
+
+
+def test_rollback_evicts_uncommitted_reads (cached_db):
+    cached_db.execute("INSERT INTO t VALUES (3, 'c')", raise_err=True)
+    assert sorted(cached_db.query_df('SELECT id FROM t')['id'])==[1, 3]
+    cached_db.rollback_changes()
+    assert cached_db.query_df('SELECT id FROM t')['id'].tolist()==[1]
+
+
+def test_pool_shares_cache_across_sessions (udb, sqlite_db):
+    cache = udb.QueryCache()
+    with udb.DBPool(sqlite_db, max_size=2, cache=cache) as pool:
+        with pool.session() as db1, pool.session() as db2:
+            assert db1 is not db2
+            assert db1.cache is cache and db2.cache is cache
+            db1.query_df('SELECT 1 AS x')
+            assert len(cache._entries)==1
+
+
+def test_uncommitted_reads_not_shared_through_pool_cache (udb, sqlite_db):
+    cache = udb.QueryCache()
+    with udb.DBPool(sqlite_db, max_size=2, cache=cache) as pool:
+        with pool.session() as db1, pool.session() as db2:
+            db1.execute('CREATE TABLE t (id INTEGER, name TEXT)',
+                        raise_err=True)
+            db1.execute("INSERT INTO t VALUES (1, 'a')", raise_err=True)
+            db1.commit_changes()
+            db1.execute("INSERT INTO t VALUES (2, 'b')", raise_err=True)
+            assert sorted(db1.query_df('SELECT id FROM t')['id'])==[1, 2]
+            assert len(cache._entries)==0
+            assert db2.query_df('SELECT id FROM t')['id'].tolist()==[1]
+            db1.rollback_changes()
+            assert db2.query_df('SELECT id FROM t')['id'].tolist()==[1]
+
+
+@pytest.mark.parametrize('sql, tables', [
+    ('SELECT * FROM a, b', {'a', 'b'}),
+    ('SELECT * FROM [a] AS x, b y WHERE x.id=y.id', {'a', 'b'}),
+    ('SELECT * FROM (SELECT id FROM c) AS s, d', {'c', 'd'}),
+    ('SELECT id FROM t WHERE id IN (SELECT id FROM u)', {'t', 'u'}),
+    ('SELECT * FROM (a INNER JOIN b ON a.i=b.i) INNER JOIN c ON c.i=a.i',
+     {'a', 'b', 'c'}),
+])
+def test_referenced_tables (udb, sql, tables):
+    assert udb.referenced_tables(sql)==tables
+
+
+def test_unparsed_from_list_not_cached (udb, cached_db):
+    sql = 'SELECT id FROM "t"'
+    assert udb.referenced_tables(sql, strict=True) is None
+    assert cached_db.query_df(sql)['id'].tolist()==[1]
+    assert len(cached_db.cache._entries)==0
+
+
+def test_comma_join_evicted_by_write_to_second_table (cached_db):
+    cached_db.execute('CREATE TABLE u (id INTEGER)', raise_err=True)
+    cached_db.commit_changes()
+    sql = 'SELECT t.id FROM t, u WHERE t.id=u.id'
+    assert len(cached_db.query_df(sql).index)==0
+    cached_db.execute('INSERT INTO u VALUES (1)', raise_err=True)
+    cached_db.commit_changes()
+    assert cached_db.query_df(sql)['id'].tolist()==[1]
+
+
+def _inserts (ids):
+    return ["INSERT INTO t VALUES ({}, 'x')".format(i) for i in ids]
+
+
+@pytest.fixture
+def db_update (udb, db, monkeypatch):
+    monkeypatch.setattr(udb.time, 'sleep', lambda seconds: None)
+    return udb.DBUpdate(db)
+
+
+def test_update_batched_skip_logs_and_continues (db, db_update, tmp_path):
+    queries = _inserts([1, 2]) + ['INSERT INTO missing VALUES (1)'] + \
+              _inserts([3])
+    committed = db_update.update_batched(queries, str(tmp_path / 'log'),
+                                         batch_size=2)
+    assert committed==4
+    assert _ids(db)==[1, 2, 3]
+    assert db.failures==1
+
+
+def test_update_batched_retries_failed_query (udb, db, db_update, tmp_path,
+                                              monkeypatch):
+    execute = db.execute
+    calls = []
+
+    def flaky_execute (sql, raise_err=False, log=True):
+        calls.append(sql)
+        if len(calls)==1:
+            raise udb.DBError('test', 'Transient failure.')
+        return execute(sql, raise_err, log)
+
+    monkeypatch.setattr(db, 'execute', flaky_execute)
+    committed = db_update.update_batched(_inserts([1, 2]),
+                                         str(tmp_path / 'log'),
+                                         on_error=udb.DBUpdate.ON_ERROR_RETRY)
+    assert committed==2
+    assert len(calls)==3
+    assert _ids(db)==[1, 2]
+    assert db.failures==0
+
+
+def test_update_batched_abort_rolls_back_batch (udb, db, db_update,
+                                                tmp_path):
+    queries = _inserts([1, 2, 3]) + ['INSERT INTO missing VALUES (1)']
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    with pytest.raises(udb.DBError):
+        db_update.update_batched(queries, str(tmp_path / 'log'),
+                                 batch_size=2,
+                                 on_error=udb.DBUpdate.ON_ERROR_ABORT,
+                                 checkpoint_path=checkpoint)
+    assert _ids(db)==[1, 2]
+    assert udb._load_checkpoint(checkpoint,
+                                udb._queries_digest(queries))==2
+
+
+def test_update_batched_resumes_from_checkpoint (udb, db, db_update,
+                                                 tmp_path):
+    # Committed ids would fail as duplicates if they were run again.
+    queries = _inserts([1, 2]) + ['INSERT INTO u VALUES (1)'] + _inserts([3])
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    kwargs = dict(batch_size=2, on_error=udb.DBUpdate.ON_ERROR_ABORT,
+                  checkpoint_path=checkpoint)
+    with pytest.raises(udb.DBError):
+        db_update.update_batched(queries, str(tmp_path / 'log'), **kwargs)
+    db.execute('CREATE TABLE u (id INTEGER)', raise_err=True)
+    db.commit_changes()
+
+    committed = db_update.update_batched(queries, str(tmp_path / 'log'),
+                                         **kwargs)
+    assert committed==2
+    assert _ids(db)==[1, 2, 3]
+    assert not os.path.exists(checkpoint)
+
+
+@pytest.fixture
+def filled_db (db):
+    db.execute("INSERT INTO t VALUES (1, 'a')", raise_err=True)
+    db.execute("INSERT INTO t VALUES (2, 'b')", raise_err=True)
+    db.execute("INSERT INTO t VALUES (3, 'c')", raise_err=True)
+    db.commit_changes()
+    return db
+
+
+@pytest.mark.parametrize('chunksize, sizes', [(1, [1, 1, 1]), (2, [2, 1]),
+                                              (3, [3]), (5, [3])])
+def test_query_iter_chunk_boundaries (filled_db, chunksize, sizes):
+    chunks = list(filled_db.query_iter('SELECT * FROM t ORDER BY id',
+                                       chunksize))
+    assert [len(c.index) for c in chunks]==sizes
+    assert pd.concat(chunks)['id'].tolist()==[1, 2, 3]
+
+
+def test_query_iter_empty_result (filled_db):
+    assert list(filled_db.query_iter('SELECT * FROM t WHERE id>3'))==[]
+
+
+def test_query_iter_projection_ignores_dropped_dtypes (filled_db):
+    chunks = filled_db.query_iter('SELECT * FROM t ORDER BY id', 2,
+                                  columns=['name'],
+                                  dtypes={'id': 'int32', 'name': 'string'})
+    df = pd.concat(chunks)
+    assert list(df.columns)==['name']
+    assert df['name'].dtype=='string'
+
+
+def test_get_table_chunks_with_idx_col_dtype (filled_db):
+    chunks = list(filled_db.get_table('t', idx_col='id', chunksize=2,
+                                      dtypes={'id': 'int32'}))
+    assert [len(c.index) for c in chunks]==[2, 1]
+    for chunk in chunks:
+        assert chunk.index.name=='id'
+        assert chunk.index.dtype=='int32'
+        assert list(chunk.columns)==['name']
+    assert pd.concat(chunks).index.tolist()==[1, 2, 3]
+
+
+def test_get_table_chunks_projected_columns (filled_db):
+    chunks = filled_db.get_table('t', columns=['name'], chunksize=2)
+    assert pd.concat(chunks)['name'].tolist()==['a', 'b', 'c']
@@ -0,0 +1,129 @@
+"""Tests for scrape_utils.DriverPool using a fake driver (no browser)."""
+import threading
+import time
+
+import pytest
+
+
+class FakeDriver(object):
+    """Stands in for a Selenium driver. Loading a url containing 'crash'
+    kills the browser and raises WebDriverException.
+    """
+    created = []
+
+    def __init__ (self):
+        self.url = None
+        self.pages = 0
+        self.dead = False
+        self.quit_called = False
+        FakeDriver.created.append(self)
+
+    @property
+    def current_url (self):
+        if self.dead:
+            from selenium.common.exceptions import WebDriverException
+            raise WebDriverException('Browser is gone.')
+        return self.url
+
+    def get (self, url):
+        if 'crash' in url:
+            self.dead = True
+            self.current_url
+        time.sleep(0.01)
+        self.url = url
+        self.pages += 1
+
+    @property
+    def page_source (self):
+        return '<p>{}</p>'.format(self.url)
+
+    def quit (self):
+        self.quit_called = True
+
+
+@pytest.fixture(autouse=True)
+def reset_fake_drivers ():
+    FakeDriver.created = []
+
+
+def test_map_urls_in_order (scrape_utils):
+    urls = ['u{}'.format(i) for i in range(20)]
+    with scrape_utils.DriverPool(FakeDriver, max_size=3) as pool:
+        soups = pool.map_urls(urls)
+    assert [s.p.text for s in soups]==urls
+    assert len(FakeDriver.created)<=3
+
+
+def test_map_urls_with_func (scrape_utils):
+    with scrape_utils.DriverPool(FakeDriver, max_size=2) as pool:
+        res = pool.map_urls(['a', 'b', 'c'], func=lambda d: d.current_url)
+    assert res==['a', 'b', 'c']
+
+
+def test_max_size_is_respected (scrape_utils):
+    in_use = []
+    peak = []
+    lock = threading.Lock()
+
+    def func (driver):
+        with lock:
+            in_use.append(driver)
+            peak.append(len(in_use))
+        time.sleep(0.02)
+        with lock:
+            in_use.remove(driver)
+
+    with scrape_utils.DriverPool(FakeDriver, max_size=2) as pool:
+        pool.map_urls(['u{}'.format(i) for i in range(10)], func=func)
+    assert max(peak)<=2
+
+
+def test_recycles_after_max_pages (scrape_utils):
+    with scrape_utils.DriverPool(FakeDriver, max_size=1,
+                                 max_pages=3) as pool:
+        for i in range(7):
+            pool.get_soup('u{}'.format(i))
+    assert len(FakeDriver.created)==3
+    assert [d.pages for d in FakeDriver.created]==[3, 3, 1]
+    assert all(d.quit_called for d in FakeDriver.created)
+
+
+def test_crashed_driver_is_quit_and_replaced (scrape_utils):
+    from selenium.common.exceptions import WebDriverException
+    with scrape_utils.DriverPool(FakeDriver, max_size=1) as pool:
+        pool.get_soup('ok')
+        with pytest.raises(WebDriverException):
+            pool.get_soup('crash')
+        crashed = FakeDriver.created[0]
+        assert crashed.quit_called
+        assert pool.get_soup('after').p.text=='after'
+    assert len(FakeDriver.created)==2
+    assert FakeDriver.created[1] is not crashed
+
+
+def test_dead_idle_driver_is_replaced (scrape_utils):
+    with scrape_utils.DriverPool(FakeDriver, max_size=1) as pool:
+        pool.get_soup('a')
+        FakeDriver.created[0].dead = True
+        assert pool.get_soup('b').p.text=='b'
+    assert len(FakeDriver.created)==2
+    assert FakeDriver.created[0].quit_called
+
+
+def test_close_quits_every_driver (scrape_utils):
+    pool = scrape_utils.DriverPool(FakeDriver, max_size=4)
+    pool.map_urls(['u{}'.format(i) for i in range(12)])
+    assert FakeDriver.created
+    pool.close()
+    assert all(d.quit_called for d in FakeDriver.created)
+    with pytest.raises(RuntimeError):
+        with pool.driver():
+            pass
+
+
+def test_driver_checked_out_during_close_is_quit (scrape_utils):
+    pool = scrape_utils.DriverPool(FakeDriver, max_size=1)
+    with pool.driver() as driver:
+        pool.close()
+        assert not driver.quit_called
+    assert driver.quit_called
@@ -0,0 +1,111 @@
+"""Tests for scrape_utils.fetch_many() against a local HTTP stand-in."""
+import gc
+import json
+import os.path
+import weakref
+
+
+def test_results_in_input_order (scrape_utils, http_server):
+    http_server.delay = 0.02
+    urls = [http_server.base_url + '/page/{}'.format(i)
+            for i in reversed(range(30))]
+    soups = scrape_utils.fetch_many(urls, concurrency=8)
+    assert [s.p.text for s in soups]==[
+        '/page/{}'.format(i) for i in reversed(range(30))]
+
+
+def test_raw_returns_bytes (scrape_utils, http_server):
+    res = scrape_utils.fetch_many([http_server.base_url + '/a'], raw=True)
+    assert res==[b'<p>/a</p>']
+
+
+def test_retries_5xx_and_429 (scrape_utils, http_server):
+    urls = [http_server.base_url + '/flaky/1',
+            http_server.base_url + '/busy/1']
+    res = scrape_utils.fetch_many(urls, retries=1, raw=True)
+    assert res==[b'<p>/flaky/1</p>', b'<p>/busy/1</p>']
+    paths = [p for p, _ in http_server.hits]
+    assert paths.count('/flaky/1')==2
+    assert paths.count('/busy/1')==2
+
+
+def test_gives_up_after_retries (scrape_utils, http_server):
+    import requests
+    try:
+        scrape_utils.fetch_many([http_server.base_url + '/flaky/2'],
+                                retries=0)
+    except requests.HTTPError as e:
+        assert e.response.status_code==503
+    else:
+        raise AssertionError('Expected HTTPError.')
+
+
+def test_per_host_throttling (scrape_utils, http_server):
+    rate = 10
+    urls = [http_server.base_url + '/t/{}'.format(i) for i in range(6)]
+    scrape_utils.fetch_many(urls, concurrency=6, per_host_rate=rate)
+    times = sorted(t for _, t in http_server.hits)
+    # Bucket holds 1 token, so requests are spaced ~1/rate apart.
+    assert times[-1] - times[0]>=(len(urls) - 1)/rate*0.9
+
+
+def test_cache_with_concurrency (scrape_utils, http_server, tmp_path):
+    cache_dir = str(tmp_path/'cache')
+    urls = [http_server.base_url + '/c/{}'.format(i) for i in range(300)]
+    cache = scrape_utils.ResponseCache(cache_dir, ttl=3600)
+    res = scrape_utils.fetch_many(urls, concurrency=8, raw=True, cache=cache)
+    assert res==['<p>/c/{}</p>'.format(i).encode() for i in range(300)]
+    with open(os.path.join(cache_dir, 'index.json')) as f:
+        assert len(json.load(f))==300
+
+    # Fresh entries are served without touching the network.
+    n_hits = len(http_server.hits)
+    assert scrape_utils.fetch_many(urls, concurrency=8, raw=True,
+                                   cache=cache)==res
+    assert len(http_server.hits)==n_hits
+    cache.close()
+
+
+def test_cache_revalidates_stale (scrape_utils, http_server, tmp_path):
+    cache = scrape_utils.ResponseCache(str(tmp_path), ttl=0)
+    url = http_server.base_url + '/stale'
+    sess = scrape_utils.get_session(cache=cache)
+    assert sess.get(url).from_cache is False
+    http_server.conns.clear()
+    for _ in range(10):
+        resp = sess.get(url)
+        assert resp.from_cache is True
+        assert resp.text=='<p>/stale</p>'
+    # 304s are read and closed so the connection is reused.
+    assert len(http_server.conns)==1
+    cache.close()
+
+
+def test_cache_hit_body_can_be_streamed (scrape_utils, http_server,
+                                         tmp_path):
+    cache = scrape_utils.ResponseCache(str(tmp_path), ttl=3600)
+    url = http_server.base_url + '/stream'
+    sess = scrape_utils.get_session(cache=cache)
+    sess.get(url)
+    resp = sess.get(url)
+    assert resp.from_cache is True
+    assert b''.join(resp.iter_content(4))==b'<p>/stream</p>'
+    assert resp.raw.read()==b'<p>/stream</p>'
+    cache.close()
+
+
+def test_cache_lru_order_persisted (scrape_utils, http_server, tmp_path):
+    urls = [http_server.base_url + '/lru/{}'.format(i) for i in range(3)]
+    with scrape_utils.ResponseCache(str(tmp_path), ttl=3600) as cache:
+        scrape_utils.fetch_many(urls, concurrency=1, raw=True, cache=cache)
+        cache.lookup(urls[0])
+    with scrape_utils.ResponseCache(str(tmp_path), ttl=3600) as cache:
+        assert list(cache._index)==urls[1:] + urls[:1]
+
+
+def test_cache_not_kept_alive_until_exit (scrape_utils, tmp_path):
+    cache = scrape_utils.ResponseCache(str(tmp_path))
+    ref = weakref.ref(cache)
+    del cache
+    gc.collect()
+    assert ref() is None
@@ -0,0 +1,86 @@
+"""
+Tests for io.py.
+"""
+import openpyxl
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def feed_path (tmp_path):
+    wb = openpyxl.Workbook()
+    wks = wb.active
+    wks.append(['DATE', 'TEAM', 'PTS', 'REST', 'SPREAD'])
+    wks.append(['2018-03-14', 'BOS', 100, 1, -2.5])
+    wks.append(['2018-03-15', 'NYK', 98, 'B2B', None])
+    wks.append(['2018-03-16', 'MIA', 105, None, 3])
+    path = str(tmp_path / 'feed-03-16-2018.xlsx')
+    wb.save(path)
+    return path
+
+
+@pytest.mark.parametrize('filters', [None, [('PTS', '>', 99)]])
+def test_read_excel_cached_cold_matches_warm (uio, feed_path, tmp_path,
+                                              filters):
+    pytest.importorskip('pyarrow')
+    cache_dir = str(tmp_path / 'cache')
+    kwargs = dict(cache_dir=cache_dir, date_cols=['DATE'], filters=filters)
+    cold = uio.read_excel_cached(feed_path, **kwargs)
+    warm = uio.read_excel_cached(feed_path, **kwargs)
+    pd.testing.assert_frame_equal(cold, warm)
+    assert set(cold['REST'].dropna())<={'1', 'B2B'}
+
+
+def test_coerce_mixed_cols_only_converts_mixed_types (uio):
+    df = pd.DataFrame({'rest': [1, 'B2B', None],
+                       'spread': [1, 2.5, None],
+                       'team': ['BOS', None, 'MIA']}, dtype=object)
+    uio._coerce_mixed_cols_to_str(df)
+    assert df['rest'].tolist()==['1', 'B2B', None]
+    assert df['spread'].tolist()==[1, 2.5, None]
+    assert df['team'].tolist()==['BOS', None, 'MIA']
+
+
+@pytest.fixture
+def ragged_path (tmp_path):
+    """Sheet whose first column ends before its stored dimensions."""
+    wb = openpyxl.Workbook()
+    wks = wb.active
+    wks.title = 'Main'
+    for i in range(1, 6):
+        wks.append([i, 'x{}'.format(i), None])
+    wks['B7'] = 'note'
+    wks['C1'] = 'hdr'
+    path = str(tmp_path / 'ragged.xlsx')
+    wb.save(path)
+    return path
+
+
+@pytest.mark.parametrize('read_only', [False, True])
+def test_wks_tools_extents (uio, ragged_path, read_only):
+    wb = openpyxl.load_workbook(ragged_path, read_only=read_only)
+    wks = wb['Main']
+    assert uio.WksTools.get_last_row(wks, 1)==5
+    assert uio.WksTools.get_last_row(wks, 2)==7
+    assert uio.WksTools.get_last_row(wks, 3)==1
+    assert uio.WksTools.get_last_col(wks, 1)==3
+    assert uio.WksTools.get_last_col(wks, 2)==2
+    wb.close()
+
+
+def test_read_excel_data_openpyxl_infers_extents (uio, ragged_path):
+    data = uio.read_excel_data_openpyxl(ragged_path, 'Main')
+    assert data==[[1, 'x1', 'hdr']] + [[i, 'x{}'.format(i), None]
+                                       for i in range(2, 6)]
+    assert uio.read_excel_data_openpyxl(ragged_path, 'Main', last_row=2,
+                                        last_col=2)==[[1, 'x1'], [2, 'x2']]
+
+
+def test_open_excel_wks_serves_several_reads (uio, ragged_path):
+    with uio.open_excel_wks(ragged_path) as wks:
+        assert list(uio.iter_wks_rows(wks, max_row=1))==[[1, 'x1', 'hdr']]
+        assert wks.max_row==7
+        chunks = list(uio.iter_wks_rows(wks, 4, max_col=2, chunk_size=3))
+    assert chunks==[[[4, 'x4'], [5, 'x5'], [None, None]], [[None, 'note']]]
+    assert list(uio.iter_excel_rows(ragged_path, 'Main', min_row=7,
+                                    max_col=2))==[[None, 'note']]